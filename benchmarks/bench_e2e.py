@@ -0,0 +1,281 @@
+"""End-to-end load test of the real application against stub servers.
+
+Boots the application from bot.py with its Bot API pointed at a local
+StubTelegramServer and OpenAI at a StubOpenAIServer, both with configurable
+latency and error injection, and replays synthetic users: each user sends
+the steps of its scenario one after another, waiting for the previous
+update to be handled and a seeded think time. Updates are fed straight into
+the application's update queue, as the webhook workers do.
+
+For every scenario the report gives throughput, per-update latency (until
+the handler finished and until the first message reached the chat) and
+event-loop lag, sampled by a timer task on the bot's loop. The same seed
+replays the same users, texts and injected errors.
+
+    python benchmarks/bench_e2e.py --scenario all --users 20 --seed 1 --output e2e.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from bisect import bisect_left
+from operator import itemgetter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from stub_openai import StubOpenAIThread
+from stub_telegram import StubTelegramThread
+
+SCENARIOS = ("random", "gpt", "resume", "translator")
+QUESTIONS = [
+    "Поясни, як працює асинхронність у Python",
+    "Що таке черга повідомлень і коли вона потрібна?",
+    "Як виміряти затримку HTTP-запиту?",
+    "Чим процес відрізняється від потоку?",
+    "Порадь книгу про розподілені системи",
+    "Як влаштований кеш LRU?",
+]
+TEXTS = [
+    "Доброго ранку! Сьогодні чудовий день для прогулянки.",
+    "Зустріч перенесли на четвер о другій годині дня.",
+    "Будь ласка, надішліть звіт до кінця тижня.",
+    "Дякую за допомогу з проєктом, без вас ми б не встигли.",
+]
+RESUME_ANSWERS = ["Backend-розробник", None, "Олена Коваль", "github.com/example/bot", "КПІ, 2020", "Python, asyncio, SQL", "комунікація, відповідальність"]
+
+
+def scenario_steps(name: str, rng: random.Random, length: int) -> list[tuple[str, str | None]]:
+    # A user's script: ("command", "/x"), ("callback", data), ("text", ...) or ("photo", None).
+    if name == "random":
+        return [("command", "/random")] + [("callback", "random")] * (length - 1)
+    if name == "gpt":
+        return [("command", "/gpt")] + [("text", rng.choice(QUESTIONS)) for _ in range(length)]
+    if name == "translator":
+        language = rng.choice(["translate_en", "translate_de", "translate_uk"])
+        return [("command", "/translator"), ("callback", language)] + [
+            ("text", " ".join(rng.sample(TEXTS, rng.randint(1, len(TEXTS))))) for _ in range(length)
+        ]
+    if name == "resume":
+        return [("command", "/resume")] + [
+            ("photo", None) if answer is None else ("text", answer) for answer in RESUME_ANSWERS
+        ]
+    raise ValueError(f"Unknown scenario {name!r}")
+
+
+class UpdateFactory:
+    def __init__(self):
+        self.update_id = 0
+        self.message_id = 0
+
+    def build(self, chat_id: int, kind: str, value: str | None) -> dict:
+        self.update_id += 1
+        self.message_id += 1
+        user = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+        message = {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": user,
+        }
+        if kind == "callback":
+            message["text"] = "menu"
+            return {
+                "update_id": self.update_id,
+                "callback_query": {
+                    "id": str(self.update_id),
+                    "from": user,
+                    "chat_instance": str(chat_id),
+                    "data": value,
+                    "message": message,
+                },
+            }
+        if kind == "photo":
+            message["photo"] = [{
+                "file_id": f"upload-{chat_id}",
+                "file_unique_id": f"upload-u{chat_id}",
+                "width": 1280,
+                "height": 960,
+                "file_size": 200_000,
+            }]
+        else:
+            message["text"] = value
+            if kind == "command":
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(value)}]
+        return {"update_id": self.update_id, "message": message}
+
+
+class Tracker:
+    # Resolves a future once the application has finished with an update.
+
+    def __init__(self):
+        self.pending: dict[int, asyncio.Future] = {}
+        self.errors = 0
+
+    def expect(self, update_id: int) -> asyncio.Future:
+        future = self.pending[update_id] = asyncio.get_running_loop().create_future()
+        return future
+
+    async def done(self, update, context) -> None:
+        future = self.pending.pop(getattr(update, "update_id", None), None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    async def error(self, update, context) -> None:
+        self.errors += 1
+        await self.done(update, context)
+
+
+async def sample_loop_lag(stats, interval: float = 0.01) -> None:
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        stats.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+def milliseconds(summary: dict) -> dict:
+    return {key: round(summary[key] * 1000, 2) for key in ("p50", "p90", "p99", "max")}
+
+
+async def run_scenario(app, tracker: Tracker, telegram, openai_stub, name: str, args, seed: int) -> dict:
+    from telegram import Update
+    from metrics import LatencyStats
+
+    rng = random.Random(seed)
+    factory = UpdateFactory()
+    completed, first_reply, loop_lag = LatencyStats(1 << 20), LatencyStats(1 << 20), LatencyStats(1 << 20)
+    errors_before = tracker.errors
+    calls_before = sum(telegram.calls.values())
+    openai_before = openai_stub.requests
+
+    async def user(index: int) -> None:
+        chat_id = 10_000 * (SCENARIOS.index(name) + 1) + index
+        steps = scenario_steps(name, rng, args.steps)
+        think = [rng.uniform(0, args.think) for _ in steps]
+        for (kind, value), pause in zip(steps, think):
+            data = factory.build(chat_id, kind, value)
+            done = tracker.expect(data["update_id"])
+            started = time.perf_counter()
+            await app.update_queue.put(Update.de_json(data, app.bot))
+            await done
+            finished = time.perf_counter()
+            completed.observe(finished - started)
+            events = telegram.events
+            for at, method, chat in events[bisect_left(events, started, key=itemgetter(0)):]:
+                if at > finished:
+                    break
+                if chat == chat_id and method.startswith(("send", "edit")):
+                    first_reply.observe(at - started)
+                    break
+            await asyncio.sleep(pause)
+
+    sampler = asyncio.create_task(sample_loop_lag(loop_lag))
+    started = time.perf_counter()
+    await asyncio.gather(*(user(index) for index in range(args.users)))
+    duration = time.perf_counter() - started
+    sampler.cancel()
+
+    return {
+        "users": args.users,
+        "updates": completed.count,
+        "duration_s": round(duration, 3),
+        "throughput_ups": round(completed.count / duration, 2),
+        "latency_ms": milliseconds(completed.summary()),
+        "first_reply_ms": milliseconds(first_reply.summary()),
+        "loop_lag_ms": milliseconds(loop_lag.summary()),
+        "handler_errors": tracker.errors - errors_before,
+        "telegram_calls": sum(telegram.calls.values()) - calls_before,
+        "openai_requests": openai_stub.requests - openai_before,
+    }
+
+
+async def run(args, telegram, openai_stub) -> dict:
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    from bot import build_application, post_init, post_shutdown
+
+    app = build_application()
+    tracker = Tracker()
+    # Group 1 runs after the routing handlers in group 0 have finished.
+    app.add_handler(TypeHandler(Update, tracker.done), group=1)
+    app.add_error_handler(tracker.error)
+
+    await app.initialize()
+    await app.start()
+    await post_init(app)
+    try:
+        scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+        return {
+            name: await run_scenario(app, tracker, telegram, openai_stub, name, args, args.seed + index)
+            for index, name in enumerate(scenarios)
+        }
+    finally:
+        await app.stop()
+        await app.shutdown()
+        await post_shutdown(app)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=5, help="messages per user after entering a mode")
+    parser.add_argument("--think", type=float, default=0.2, help="maximum pause between a user's messages")
+    parser.add_argument("--openai-latency", type=float, default=0.3)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--telegram-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    with StubTelegramThread(latency=args.telegram_latency, error_rate=args.telegram_error_rate, seed=args.seed) as telegram, \
+            StubOpenAIThread(latency=args.openai_latency, error_rate=args.openai_error_rate, seed=args.seed) as openai_stub:
+        # Settings are read at import time, so they are set before bot.py is imported.
+        os.environ.update({
+            "BOT_TOKEN": "1000:stub",
+            "CHATGPT_TOKEN": "stub",
+            "BOT_API_BASE_URL": telegram.base_url,
+            "BOT_API_FILE_URL": telegram.file_url,
+            "OPENAI_BASE_URL": openai_stub.base_url,
+            "OPENAI_PROXY": "",
+            "STATE_BACKEND": "none",
+            "COMPLETION_CACHE_DB": "",
+            "IMAGE_CACHE_PATH": os.path.join(workdir, "image_file_ids.json"),
+            "METRICS_PORT": "0",
+            "LOG_FILE": "",
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        })
+        from logs import setup_logging, stop_logging
+        setup_logging()
+        try:
+            scenarios = asyncio.run(run(args, telegram, openai_stub))
+        finally:
+            stop_logging()
+        from models import model_router
+        report = {
+            "seed": args.seed,
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "scenario")},
+            "scenarios": scenarios,
+            "telegram": {"calls": dict(telegram.calls), "injected_errors": telegram.errors},
+            "openai": {
+                "requests": openai_stub.requests,
+                "injected_errors": openai_stub.errors,
+                "cached_prompt_ratio": model_router.stats()["cached_ratio"],
+            },
+        }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""N concurrent chats against a local stub OpenAI server.
+
+Compares the old blocking client (sync OpenAI inside an async method) with
+the async ChatGPTService. With the async engine N chats should finish in
+roughly the latency of a single completion.
+
+    python benchmarks/bench_gpt_concurrency.py --chats 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from stub_openai import StubOpenAIThread
+
+
+async def run_blocking(base_url: str, chats: int) -> float:
+    from openai import OpenAI
+
+    client = OpenAI(api_key="stub", base_url=base_url)
+
+    async def chat(i: int) -> str:
+        completion = client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": f"hello {i}"}],
+        )
+        return completion.choices[0].message.content
+
+    started = time.perf_counter()
+    await asyncio.gather(*(chat(i) for i in range(chats)))
+    return time.perf_counter() - started
+
+
+async def run_async(chats: int, rounds: int) -> tuple[float, dict]:
+    from gpt import ChatGPTService
+    from transport import close_http_client, connection_stats
+
+    services = [ChatGPTService("stub") for _ in range(chats)]
+    started = time.perf_counter()
+    for round_index in range(rounds):
+        await asyncio.gather(*(
+            service.send_question("You are a stub.", f"hello {i} #{round_index}")
+            for i, service in enumerate(services)
+        ))
+    elapsed = (time.perf_counter() - started) / rounds
+    stats = connection_stats.summary()
+    await close_http_client()
+    return elapsed, stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with StubOpenAIThread(latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_PROXY"] = ""
+        os.environ.setdefault("OPENAI_MAX_CONCURRENCY", str(args.chats))
+
+        blocking = asyncio.run(run_blocking(server.base_url, args.chats))
+        concurrent, connections = asyncio.run(run_async(args.chats, args.rounds))
+
+    print(f"chats={args.chats} latency={args.latency:.2f}s")
+    print(f"blocking client: {blocking:.2f}s")
+    print(f"async client:    {concurrent:.2f}s")
+    print(f"speed-up:        {blocking / concurrent:.1f}x")
+    print(
+        f"connections:     {connections['connections']} for {connections['requests']} requests "
+        f"({connections['reuse_ratio']:.0%} reused)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Per-message cost of intent matching as the keyword set grows.
+
+Compares the old approach (lowercase, then `keyword in text` for every
+keyword of every list) with the trie-compiled regex in intents.py, for
+growing numbers of synthetic stems on top of the real ones.
+
+    python benchmarks/bench_intents.py --sizes 10 100 500 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from intents import IntentMatcher, parse_stems
+from resources import catalogue
+
+MESSAGES = [
+    "Розкажи мені щось цікаве про космос",
+    "Переклади, будь ласка, цей абзац на англійську мову",
+    "Хочу поговорити з відомою особистістю про програмування",
+    "Can you translate this paragraph into German for me?",
+    "Ich habe eine Frage zu meinem Lebenslauf",
+    "привіт, як справи? що ти вмієш робити?",
+    "Just saying hello, nothing in particular here to match at all",
+]
+LETTERS = "абвгдеєжзиіїйклмнопрстуфхцчшщьюяabcdefghijklmnopqrstuvwxyz"
+
+
+def synthetic_stems(count: int, rng: random.Random) -> list[str]:
+    return ["".join(rng.choice(LETTERS) for _ in range(rng.randint(4, 9))) for _ in range(count)]
+
+
+def legacy_match(lists: dict[str, list[str]], text: str) -> str | None:
+    text = text.lower()
+    for intent, keywords in lists.items():
+        if any(keyword in text for keyword in keywords):
+            return intent
+    return None
+
+
+def per_message(func, rounds: int) -> float:
+    started = time.perf_counter()
+    for index in range(rounds):
+        func(MESSAGES[index % len(MESSAGES)])
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = {
+        key.split("/", 1)[1]: parse_stems(catalogue.get(key))
+        for key in sorted(catalogue.keys("intents/"))
+    }
+    print(f"{'stems':>6} {'substring scan':>16} {'compiled trie':>15}")
+    for size in args.sizes:
+        extra = synthetic_stems(size, rng)
+        stems = {intent: dict(words) for intent, words in base.items()}
+        for index, stem in enumerate(extra):
+            stems[list(stems)[index % len(stems)]][stem] = 1.0
+        lists = {intent: list(words) for intent, words in stems.items()}
+        matcher = IntentMatcher(stems)
+        total = sum(len(words) for words in stems.values())
+        legacy = per_message(lambda text: legacy_match(lists, text), args.rounds)
+        compiled = per_message(matcher.scores, args.rounds)
+        print(f"{total:>6} {legacy:>13.1f} us {compiled:>12.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Event-loop lag while many resume PDFs render at once, inline versus pool.
+
+A ticker task sleeps 10 ms in a loop and records how late it wakes up;
+that overshoot is the delay every other chat would see.
+
+    python benchmarks/bench_pdf_offload.py --resumes 20 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from metrics import LatencyStats
+from pdf import PdfRenderer
+
+PHOTO = os.path.join(SRC_DIR, "resources", "images", "resume.png")
+RESUME_TEXT = "\n".join(
+    f"Рядок резюме {i}: досвід роботи, проєкти, технології та досягнення."
+    for i in range(120)
+)
+
+
+async def ticker(lag: LatencyStats, stop: asyncio.Event, interval: float = 0.01) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag.observe(time.perf_counter() - started - interval)
+
+
+async def run(workers: int, resumes: int) -> tuple[float, dict]:
+    renderer = PdfRenderer(workers=workers, max_pending=resumes)
+    with open(PHOTO, "rb") as photo:
+        data = {"name": "Test User", "specialty": "Python developer", "photo": photo.read()}
+    if workers:
+        # Start the worker processes before measuring.
+        await renderer.render_resume(data, "warm-up")
+
+    lag = LatencyStats()
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lag, stop))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        renderer.render_resume(data, RESUME_TEXT)
+        for _ in range(resumes)
+    ))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await tick
+    renderer.shutdown()
+    return elapsed, lag.summary()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resumes", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    for workers in (0, args.workers):
+        elapsed, lag = asyncio.run(run(workers, args.resumes))
+        mode = "inline" if workers == 0 else f"pool({workers})"
+        print(
+            f"{mode:<9} resumes={args.resumes} total={elapsed:.2f}s "
+            f"loop lag p50={lag['p50'] * 1000:.1f}ms p99={lag['p99'] * 1000:.1f}ms "
+            f"max={lag['max'] * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
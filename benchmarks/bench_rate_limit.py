@@ -0,0 +1,95 @@
+"""A burst of bulk requests plus a few interactive ones against a rate-limited stub.
+
+Without the limiter every request past the upstream limit fails with a 429;
+with it the burst is spread over time, nothing fails and interactive
+requests overtake the bulk queue.
+
+    python benchmarks/bench_rate_limit.py --bulk 60 --interactive 10 --rpm 600
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from stub_openai import StubOpenAIThread
+
+
+async def run(bulk: int, interactive: int, limited: bool) -> dict:
+    import gpt
+    from conversations import ConversationStore
+    from completion_cache import CompletionCache
+    from metrics import LatencyStats
+    from ratelimit import PRIORITY_BULK, PRIORITY_INTERACTIVE, RateLimiter
+    from transport import close_http_client
+
+    if limited:
+        gpt.request_limiter = RateLimiter()
+        gpt.OPENAI_MAX_RETRIES = 4
+    else:
+        gpt.request_limiter = RateLimiter(requests_per_min=0, tokens_per_min=0)
+        gpt.OPENAI_MAX_RETRIES = 0
+    service = gpt.ChatGPTService("stub", store=ConversationStore(), cache=CompletionCache(max_entries=0))
+    latency = {PRIORITY_BULK: LatencyStats(), PRIORITY_INTERACTIVE: LatencyStats()}
+    failures = 0
+
+    async def ask(i: int, priority: int) -> None:
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            await service.send_question("You are a stub.", f"question {priority}/{i}", priority=priority)
+        except Exception:
+            failures += 1
+            return
+        latency[priority].observe(time.perf_counter() - started)
+
+    async def late_interactive() -> None:
+        await asyncio.sleep(0.5)
+        await asyncio.gather(*(ask(i, PRIORITY_INTERACTIVE) for i in range(interactive)))
+
+    started = time.perf_counter()
+    await asyncio.gather(late_interactive(), *(ask(i, PRIORITY_BULK) for i in range(bulk)))
+    elapsed = time.perf_counter() - started
+    await close_http_client()
+    return {
+        "elapsed": elapsed,
+        "failures": failures,
+        "interactive": latency[PRIORITY_INTERACTIVE].summary(),
+        "bulk": latency[PRIORITY_BULK].summary(),
+        "limiter": gpt.request_limiter.stats(),
+    }
+
+
+def report(name: str, result: dict) -> None:
+    print(f"{name}: {result['elapsed']:.2f}s, {result['failures']} failed, {result['limiter']['retries']} retries")
+    for kind in ("interactive", "bulk"):
+        stats = result[kind]
+        if stats["count"]:
+            print(f"  {kind:<11} ok={stats['count']:<3} p50={stats['p50']:.2f}s max={stats['max']:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bulk", type=int, default=60)
+    parser.add_argument("--interactive", type=int, default=10)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with StubOpenAIThread(latency=args.latency, requests_per_min=args.rpm) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_PROXY"] = ""
+        os.environ.setdefault("CHATGPT_TOKEN", "stub")
+        for limited in (False, True):
+            rejected = server.rate_limited
+            result = asyncio.run(run(args.bulk, args.interactive, limited))
+            report("with limiter" if limited else "no limiter", result)
+            print(f"  upstream 429 responses: {server.rate_limited - rejected}")
+            # Let the stub's one-second bucket refill between runs.
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Prompt/message lookup: per-call file reads versus the preloaded catalogue.
+
+    python benchmarks/bench_resources.py --iterations 100000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from resources import ResourceCatalogue
+
+NAMES = ["gpt", "random", "talk_linus_torvalds", "translator/en"]
+
+
+def load_prompt_from_disk(name: str) -> str:
+    prompt_path = os.path.join(SRC_DIR, 'resources', 'prompts', f'{name}.txt')
+    with open(prompt_path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    catalogue = ResourceCatalogue()
+
+    def disk() -> None:
+        for name in NAMES:
+            load_prompt_from_disk(name)
+
+    def cached() -> None:
+        for name in NAMES:
+            catalogue.get(f"prompts/{name}")
+
+    lookups = args.iterations * len(NAMES)
+    disk_time = timeit.timeit(disk, number=args.iterations)
+    cached_time = timeit.timeit(cached, number=args.iterations)
+    reload_time = timeit.timeit(catalogue.reload_if_changed, number=1000) / 1000
+
+    print(f"lookups={lookups}")
+    print(f"per-call file read: {disk_time / lookups * 1e6:.2f} us/lookup")
+    print(f"catalogue:          {cached_time / lookups * 1e6:.3f} us/lookup")
+    print(f"speed-up:           {disk_time / cached_time:.0f}x")
+    print(f"mtime check:        {reload_time * 1e6:.1f} us/poll (background thread)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Routing cost per update: the old handler chain versus the dispatch table.
+
+The old setup registered four CallbackQueryHandlers whose patterns PTB tried
+in turn, and a MessageHandler that walked an if-chain over
+conversation_state. The router needs one handler check and one dict lookup.
+Handlers are no-ops, so only the routing itself is measured.
+
+    python benchmarks/bench_router.py --rounds 200000
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from telegram import CallbackQuery, Chat, Message, Update, User
+from telegram.ext import CallbackQueryHandler, MessageHandler, filters
+
+from router import Router
+
+CALLBACKS = ["start", "random", "translate_de", "talk_guido_van_rossum", "resume_restart"]
+STATES = [None, "gpt", "talk", "translator", "resume"]
+
+
+async def noop(update, context):
+    return None
+
+
+def legacy_callback_handlers() -> list:
+    # Same order and patterns as bot.py registered them before.
+    return [
+        CallbackQueryHandler(noop, pattern="^resume_"),
+        CallbackQueryHandler(noop, pattern="^(translate_en|translate_uk|translate_de|translator|start)$"),
+        CallbackQueryHandler(noop, pattern="^(talk_linus_torvalds|talk_guido_van_rossum|talk_mark_zuckerberg|start)$"),
+        CallbackQueryHandler(noop, pattern="^(random|start)$"),
+    ]
+
+
+def legacy_message_route(state: str | None, text: str | None) -> str:
+    if not text:
+        if state == "resume":
+            return "resume"
+        return ""
+    if state == "gpt":
+        return "gpt"
+    if state == "talk":
+        return "talk"
+    if state == "translator":
+        return "translator"
+    if state == "resume":
+        return "resume"
+    return "fallback"
+
+
+def build_router() -> Router:
+    router = Router()
+    router.callback("translate_en", "translate_uk", "translate_de", "translator")(noop)
+    router.callback("random")(noop)
+    router.callback("start")(noop)
+    router.callback_prefix("talk_")(noop)
+    router.callback_prefix("resume_")(noop)
+    for state in STATES[1:]:
+        router.state(state, media=state == "resume")(noop)
+    router.fallback("intent")(noop)
+    return router
+
+
+def callback_update(data: str) -> Update:
+    user = User(id=1, first_name="bench", is_bot=False)
+    return Update(update_id=1, callback_query=CallbackQuery(id="1", from_user=user, chat_instance="1", data=data))
+
+
+def message_update(text: str) -> Update:
+    user = User(id=1, first_name="bench", is_bot=False)
+    message = Message(
+        message_id=1,
+        date=datetime.datetime.now(datetime.timezone.utc),
+        chat=Chat(id=1, type="private"),
+        from_user=user,
+        text=text,
+    )
+    return Update(update_id=1, message=message)
+
+
+def per_update(func, items: list, rounds: int) -> float:
+    started = time.perf_counter()
+    for index in range(rounds):
+        func(items[index % len(items)])
+    return (time.perf_counter() - started) / rounds * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200000)
+    args = parser.parse_args()
+
+    router = build_router()
+    legacy = legacy_callback_handlers()
+    single = CallbackQueryHandler(noop)
+    message_handler = MessageHandler(filters.TEXT | filters.PHOTO | filters.Document.ALL, noop)
+    callbacks = [callback_update(data) for data in CALLBACKS]
+    messages = [(message_update("hello"), state) for state in STATES]
+
+    def legacy_callback(update: Update) -> None:
+        for handler in legacy:
+            if handler.check_update(update):
+                return
+
+    def routed_callback(update: Update) -> None:
+        single.check_update(update)
+        router.resolve_callback(update.callback_query.data)
+
+    def legacy_message(item) -> None:
+        update, state = item
+        message_handler.check_update(update)
+        legacy_message_route(state, update.message.text)
+
+    def routed_message(item) -> None:
+        update, state = item
+        message_handler.check_update(update)
+        router.resolve_message(state, bool(update.message.text))
+
+    results = {
+        "callback, handler chain": per_update(legacy_callback, callbacks, args.rounds),
+        "callback, router": per_update(routed_callback, callbacks, args.rounds),
+        "message, if-chain": per_update(legacy_message, messages, args.rounds),
+        "message, router": per_update(routed_message, messages, args.rounds),
+    }
+    for name, nanoseconds in results.items():
+        print(f"{name:<24} {nanoseconds:8.0f} ns/update")
+
+
+if __name__ == "__main__":
+    main()
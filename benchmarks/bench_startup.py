@@ -0,0 +1,119 @@
+"""Cold start: time from process start to the first handled update.
+
+Starts `python src/bot.py` in polling mode against a StubTelegramServer that
+hands out one /start update, and measures until the bot's first message to
+that chat reaches the stub. The import time of bot.py is measured in a
+separate process. Each run is a fresh interpreter, so nothing is cached.
+
+    python benchmarks/bench_startup.py --runs 5 --target 1.0
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+
+from stub_openai import StubOpenAIThread
+from stub_telegram import StubTelegramThread
+
+CHAT_ID = 4242
+START_UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 1,
+        "date": 0,
+        "chat": {"id": CHAT_ID, "type": "private"},
+        "from": {"id": CHAT_ID, "is_bot": False, "first_name": "bench"},
+        "text": "/start",
+        "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+    },
+}
+IMPORT_SNIPPET = (
+    "import sys, time; started = time.perf_counter(); sys.path.insert(0, sys.argv[1]); "
+    "import bot; print(time.perf_counter() - started)"
+)
+
+
+def bot_env(telegram, openai_stub, workdir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "BOT_TOKEN": "1000:stub",
+        "CHATGPT_TOKEN": "stub",
+        "BOT_API_BASE_URL": telegram.base_url,
+        "BOT_API_FILE_URL": telegram.file_url,
+        "OPENAI_BASE_URL": openai_stub.base_url,
+        "OPENAI_PROXY": "",
+        "STATE_BACKEND": "none",
+        "COMPLETION_CACHE_DB": "",
+        "IMAGE_CACHE_PATH": os.path.join(workdir, "image_file_ids.json"),
+        "RANDOM_POOL_SIZE": os.environ.get("RANDOM_POOL_SIZE", "5"),
+        "LOG_FILE": "",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    })
+    return env
+
+
+def first_reply(telegram, started: float, timeout: float) -> float | None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        for at, method, chat in list(telegram.events):
+            if chat == CHAT_ID and at >= started and method.startswith("send"):
+                return at - started
+        time.sleep(0.005)
+    return None
+
+
+def cold_start(telegram, env: dict, timeout: float) -> float | None:
+    telegram.events.clear()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, "bot.py")], env=env, cwd=SRC_DIR)
+    try:
+        return first_reply(telegram, started, timeout)
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def import_time(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET, SRC_DIR], env=env, cwd=SRC_DIR,
+        capture_output=True, text=True, check=True,
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target", type=float, default=1.0, help="seconds to the first handled update")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    with StubTelegramThread(latency=0.0, updates=[START_UPDATE]) as telegram, \
+            StubOpenAIThread(latency=0.05) as openai_stub:
+        env = bot_env(telegram, openai_stub, workdir)
+        imports = [import_time(env) for _ in range(args.runs)]
+        starts = [cold_start(telegram, env, args.timeout) for _ in range(args.runs)]
+
+    if None in starts:
+        print(f"{starts.count(None)} of {args.runs} runs did not answer within {args.timeout:.0f}s")
+        starts = [value for value in starts if value is not None]
+    print(f"import bot.py         median {statistics.median(imports):.3f}s  (min {min(imports):.3f}s)")
+    if starts:
+        median = statistics.median(starts)
+        verdict = "within" if median <= args.target else "over"
+        print(f"first handled update  median {median:.3f}s  (min {min(starts):.3f}s), {verdict} the {args.target:.1f}s target")
+
+
+if __name__ == "__main__":
+    main()
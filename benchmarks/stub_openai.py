@@ -0,0 +1,236 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+
+class StubOpenAIServer:
+    """Minimal OpenAI-compatible HTTP server for local benchmarks.
+
+    ``requests_per_min`` emulates an upstream rate limit: requests beyond it
+    get a 429 and every response carries ``x-ratelimit-*`` headers.
+    ``error_rate`` makes that share of requests fail with a 500. Usage
+    reports a leading system message as cached once the same bytes have
+    been seen before, roughly like upstream prompt caching.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.5,
+        requests_per_min: float = 0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.requests_per_min = requests_per_min
+        self.error_rate = error_rate
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._prefixes: set[str] = set()
+        self._allowance = requests_per_min / 60
+        self._allowance_updated = time.monotonic()
+        self._server: asyncio.base_events.Server | None = None
+        self._connections: set[asyncio.StreamWriter] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        while self._connections:
+            await asyncio.sleep(0.01)
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                payload = json.loads(body or b"{}")
+                self.requests += 1
+                if not self._admit():
+                    self.rate_limited += 1
+                    await self._error(writer, 429, "Rate limit reached", retry_after=60 / self.requests_per_min)
+                    continue
+                if self.error_rate and self._random.random() < self.error_rate:
+                    self.errors += 1
+                    await self._error(writer, 500, "Injected failure")
+                    continue
+                if payload.get("stream"):
+                    await self._stream(writer, payload)
+                    continue
+                await asyncio.sleep(self.latency)
+                response = json.dumps(self._completion(payload)).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    + self._limit_headers()
+                    + b"Content-Length: " + str(len(response)).encode() + b"\r\n\r\n"
+                    + response
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    def _admit(self) -> bool:
+        # Token bucket holding one second's worth of requests.
+        if not self.requests_per_min:
+            return True
+        now = time.monotonic()
+        per_second = self.requests_per_min / 60
+        self._allowance = min(per_second, self._allowance + (now - self._allowance_updated) * per_second)
+        self._allowance_updated = now
+        if self._allowance < 1:
+            return False
+        self._allowance -= 1
+        return True
+
+    def _limit_headers(self) -> bytes:
+        if not self.requests_per_min:
+            return b""
+        return (
+            f"x-ratelimit-limit-requests: {int(self.requests_per_min)}\r\n"
+            f"x-ratelimit-remaining-requests: {int(self._allowance)}\r\n"
+            f"x-ratelimit-reset-requests: {60 / self.requests_per_min:.3f}s\r\n"
+        ).encode()
+
+    async def _error(self, writer: asyncio.StreamWriter, status: int, message: str, retry_after: float | None = None) -> None:
+        response = json.dumps({"error": {"message": message, "type": "stub_error", "code": None}}).encode()
+        reason = {429: "Too Many Requests", 500: "Internal Server Error"}[status]
+        retry = f"retry-after: {retry_after:.3f}\r\n".encode() if retry_after else b""
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n".encode()
+            + b"Content-Type: application/json\r\n"
+            + self._limit_headers()
+            + retry
+            + b"Content-Length: " + str(len(response)).encode() + b"\r\n\r\n"
+            + response
+        )
+        await writer.drain()
+
+    def _reply(self, payload: dict) -> str:
+        last = payload.get("messages", [{}])[-1].get("content", "")
+        return f"stub reply to: {last}"
+
+    def _usage(self, payload: dict, completion_tokens: int) -> dict:
+        messages = payload.get("messages") or []
+        prompt_tokens = sum(len(message.get("content") or "") // 4 + 4 for message in messages)
+        cached = 0
+        if messages and messages[0].get("role") == "system":
+            prefix = json.dumps(messages[0], ensure_ascii=False)
+            if prefix in self._prefixes:
+                cached = len(messages[0].get("content") or "") // 4 + 4
+            self._prefixes.add(prefix)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    async def _stream(self, writer: asyncio.StreamWriter, payload: dict) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            + self._limit_headers()
+            + b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        words = self._reply(payload).split(" ")
+        for index, word in enumerate(words):
+            await asyncio.sleep(self.latency / len(words))
+            chunk = {
+                "id": f"chatcmpl-stub-{self.requests}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": word if index == 0 else " " + word},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            self._write_chunk(writer, f"data: {json.dumps(chunk)}\n\n".encode())
+            await writer.drain()
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            chunk = {
+                "id": f"chatcmpl-stub-{self.requests}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model", "stub"),
+                "choices": [],
+                "usage": self._usage(payload, len(words)),
+            }
+            self._write_chunk(writer, f"data: {json.dumps(chunk)}\n\n".encode())
+        self._write_chunk(writer, b"data: [DONE]\n\n")
+        self._write_chunk(writer, b"")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def _completion(self, payload: dict) -> dict:
+        return {
+            "id": f"chatcmpl-stub-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": self._reply(payload)},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": self._usage(payload, 10),
+        }
+
+
+class StubOpenAIThread:
+    """Runs a stub server on its own event loop in a background thread."""
+
+    server_class = StubOpenAIServer
+
+    def __init__(self, **kwargs):
+        self.server = self.server_class(**kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    def __enter__(self) -> StubOpenAIServer:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self._loop).result()
+        return self.server
+
+    def __exit__(self, *exc) -> None:
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
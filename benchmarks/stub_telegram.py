@@ -0,0 +1,200 @@
+import io
+import json
+import time
+import random
+import asyncio
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qsl
+
+from PIL import Image
+
+from stub_openai import StubOpenAIThread
+
+BOT_USER = {"id": 1000, "is_bot": True, "first_name": "Stub", "username": "stub_bot"}
+
+
+class StubTelegramServer:
+    """Minimal Bot API server for local benchmarks.
+
+    Answers the methods the bot calls with plausible objects after
+    ``latency`` seconds and serves a generated JPEG for every file
+    download. ``error_rate`` makes that share of calls fail with Telegram's
+    flood-control 429. Every call is recorded in ``events`` as
+    ``(perf_counter, method, chat_id)`` so callers can see when a chat got
+    its answer. ``updates`` are handed out to a polling bot via getUpdates.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.05,
+        error_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: int = 0,
+        updates: list[dict] | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.errors = 0
+        self.events: list[tuple[float, str, int | None]] = []
+        self.updates = list(updates or [])
+        self._random = random.Random(seed)
+        self._message_id = 0
+        self._photo = self._jpeg(seed)
+        self._server: asyncio.base_events.Server | None = None
+        self._connections: set[asyncio.StreamWriter] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot"
+
+    @property
+    def file_url(self) -> str:
+        return f"http://{self.host}:{self.port}/file/bot"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        while self._connections:
+            await asyncio.sleep(0.01)
+        await self._server.wait_closed()
+
+    @staticmethod
+    def _jpeg(seed: int) -> bytes:
+        rng = random.Random(seed)
+        image = Image.new("RGB", (1280, 960), tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=90)
+        return buffer.getvalue()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                path = request_line.decode("latin-1").split(" ")[1]
+                await asyncio.sleep(self.latency)
+                if path.startswith("/file/"):
+                    self._write(writer, 200, self._photo, "image/jpeg")
+                else:
+                    method = path.rsplit("/", 1)[-1]
+                    params = self._parse(headers.get("content-type", ""), body)
+                    if method == "getUpdates":
+                        self._write(writer, 200, await self._get_updates(params))
+                    else:
+                        self._write(writer, *self._call(method, params))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    @staticmethod
+    def _parse(content_type: str, body: bytes) -> dict:
+        if content_type.startswith("multipart/"):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )
+            return {
+                part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                for part in message.iter_parts()
+            }
+        if content_type.startswith("application/json"):
+            return json.loads(body or b"{}")
+        return dict(parse_qsl(body.decode()))
+
+    async def _get_updates(self, params: dict) -> bytes:
+        offset = int(params.get("offset") or 0)
+        updates = [update for update in self.updates if update["update_id"] >= offset]
+        if not updates:
+            # Long polling: hold the request for a while, then report nothing new.
+            await asyncio.sleep(min(float(params.get("timeout") or 0), 0.5))
+        return json.dumps({"ok": True, "result": updates}).encode()
+
+    def _call(self, method: str, params: dict) -> tuple[int, bytes]:
+        chat_id = params.get("chat_id")
+        if isinstance(chat_id, bytes):
+            chat_id = chat_id.decode()
+        chat_id = int(chat_id) if chat_id not in (None, "") else None
+        self.calls[method] += 1
+        self.events.append((time.perf_counter(), method, chat_id))
+        if self.error_rate and method != "getMe" and self._random.random() < self.error_rate:
+            self.errors += 1
+            return 429, json.dumps({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }).encode()
+        return 200, json.dumps({"ok": True, "result": self._result(method, chat_id, params)}).encode()
+
+    def _message(self, chat_id: int | None, **fields) -> dict:
+        self._message_id += 1
+        return {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id or 0, "type": "private"},
+            "from": BOT_USER,
+            **fields,
+        }
+
+    def _result(self, method: str, chat_id: int | None, params: dict):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getFile":
+            file_id = params.get("file_id", "")
+            return {
+                "file_id": file_id,
+                "file_unique_id": f"u-{file_id}",
+                "file_size": len(self._photo),
+                "file_path": f"photos/{file_id}.jpg",
+            }
+        if method == "sendPhoto":
+            size = {"file_id": f"photo-{self._message_id}", "file_unique_id": f"p{self._message_id}", "width": 1280, "height": 960}
+            return self._message(chat_id, photo=[size])
+        if method == "sendDocument":
+            document = {"file_id": f"doc-{self._message_id}", "file_unique_id": f"d{self._message_id}"}
+            return self._message(chat_id, document=document)
+        if method in ("sendMessage", "editMessageText"):
+            text = params.get("text", "")
+            return self._message(chat_id, text=text.decode() if isinstance(text, bytes) else text)
+        return True
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str = "application/json") -> None:
+        reason = {200: "OK", 429: "Too Many Requests"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+
+
+class StubTelegramThread(StubOpenAIThread):
+    """Runs a StubTelegramServer on its own event loop in a background thread."""
+
+    server_class = StubTelegramServer
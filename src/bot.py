@@ -1,62 +1,151 @@
+# Imported first: it records the start time and, with STARTUP_PROFILE set,
+# profiles every import that follows.
+import startup
+
+import asyncio
+
 from telegram import Update
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     CommandHandler,
     CallbackQueryHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
-from config import BOT_TOKEN
+from config import (
+    BOT_TOKEN,
+    BOT_API_BASE_URL,
+    BOT_API_FILE_URL,
+    BOT_MODE,
+    CHATGPT_TOKEN,
+    DROP_PENDING_UPDATES,
+    STARTUP_PROFILE,
+)
+from transport import close_http_client, connection_stats, preload
+from resources import catalogue
+from pdf import pdf_renderer
+from scheduler import ChatSerialUpdateProcessor
+from outbound import OutboundRateLimiter
+from persistence import build_persistence
+from completion_cache import completion_cache
+from gpt import flights
+from router import router
+from metrics import instrumented, metrics_server, registry
+from logs import setup_logging, stop_logging
+from ratelimit import request_limiter
+from conversations import conversation_store
+from models import model_router
+from prefixes import prefix_cache
 from handlers import (
+    fact_pool,
     start,
     random,
-    random_button,
     gpt,
-    message_handler,
 )
-from talk import talk, talk_button
-from translator import translator, translator_button, handle_translation
-from resume import resume, message_handler_resume, resume_callback
+from talk import talk
+from translator import translator
+from resume import resume
 
+_background_tasks: set[asyncio.Task] = set()
 
-app = ApplicationBuilder().token(BOT_TOKEN).build()
 
-app.add_handler(CommandHandler("start", start))
-app.add_handler(CommandHandler("random", random))
-app.add_handler(CommandHandler("gpt", gpt))
-app.add_handler(CommandHandler("talk", talk))
-app.add_handler(CommandHandler("translator", lambda update, context: translator(update, context, start_func=start)))
-app.add_handler(CommandHandler("resume", resume))
+async def warm_up() -> None:
+    # The openai client is built in a thread so the first updates are not
+    # held up by its import; the fact pool needs it, so it starts after.
+    await asyncio.to_thread(preload, CHATGPT_TOKEN)
+    startup.mark("OpenAI client ready")
+    fact_pool.refill()
 
-app.add_handler(
-    CallbackQueryHandler(resume_callback, pattern="^resume_")
-)
-app.add_handler(
-    CallbackQueryHandler(
-        lambda update, context: translator_button(update, context, start_func=start),
-        pattern="^(translate_en|translate_uk|translate_de|translator|start)$"
-    )
-)
-app.add_handler(
-    CallbackQueryHandler(
-        talk_button,
-        pattern="^(talk_linus_torvalds|talk_guido_van_rossum|talk_mark_zuckerberg|start)$"
+
+async def post_init(application) -> None:
+    startup.mark("application initialised")
+    task = asyncio.create_task(warm_up())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    registry.collect("bot_openai_limiter", request_limiter.stats)
+    registry.collect("bot_openai_connections", connection_stats.summary)
+    registry.collect("bot_conversations", conversation_store.stats)
+    registry.collect("bot_fact_pool", fact_pool.stats)
+    registry.collect("bot_telegram", application.bot.rate_limiter.stats)
+    registry.collect("bot_scheduler", application.update_processor.stats)
+    registry.collect("bot_models", model_router.stats)
+    registry.collect("bot_completion_cache", completion_cache.stats)
+    registry.collect("bot_singleflight", flights.stats)
+    registry.collect("bot_prompt_prefixes", prefix_cache.stats)
+    await metrics_server.start()
+
+
+async def post_shutdown(application) -> None:
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await fact_pool.close()
+    completion_cache.close()
+    catalogue.stop()
+    pdf_renderer.shutdown()
+    await close_http_client()
+    await metrics_server.stop()
+
+
+def build_application() -> Application:
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .base_url(BOT_API_BASE_URL)
+        .base_file_url(BOT_API_FILE_URL)
+        .concurrent_updates(ChatSerialUpdateProcessor())
+        .rate_limiter(OutboundRateLimiter())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
     )
-)
-app.add_handler(
-    CallbackQueryHandler(
-        random_button,
-        pattern="^(random|start)$"
+    persistence = build_persistence()
+    if persistence is not None:
+        builder.persistence(persistence)
+    app = builder.build()
+
+    app.add_handler(CommandHandler("start", instrumented("start", start)))
+    app.add_handler(CommandHandler("random", instrumented("random", random)))
+    app.add_handler(CommandHandler("gpt", instrumented("gpt", gpt)))
+    app.add_handler(CommandHandler("talk", instrumented("talk", talk)))
+    app.add_handler(CommandHandler("translator", instrumented("translator", translator)))
+    app.add_handler(CommandHandler("resume", instrumented("resume", resume)))
+
+    app.add_handler(CallbackQueryHandler(router.dispatch_callback))
+    app.add_handler(
+        MessageHandler(
+            filters.TEXT | filters.PHOTO | filters.Document.ALL,
+            router.dispatch_message
+        )
     )
-)
-app.add_handler(
-    MessageHandler(
-        filters.TEXT | filters.PHOTO | filters.Document.ALL,
-        message_handler
+    if STARTUP_PROFILE:
+        app.add_handler(TypeHandler(Update, startup.first_update), group=99)
+    return app
+
+
+def run_polling() -> None:
+    app = build_application()
+    catalogue.watch()
+    app.run_polling(
+        drop_pending_updates=DROP_PENDING_UPDATES,
+        allowed_updates=Update.ALL_TYPES
     )
-)
-app.run_polling(
-    drop_pending_updates=True,
-    allowed_updates=Update.ALL_TYPES
-)
\ No newline at end of file
+
+
+def main() -> None:
+    setup_logging()
+    startup.mark("modules imported")
+    try:
+        if BOT_MODE == "webhook":
+            from webhook import run_webhook
+            run_webhook()
+        else:
+            run_polling()
+    finally:
+        stop_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from config import COMPLETION_CACHE_SIZE, COMPLETION_CACHE_DB, COMPLETION_CACHE_TTLS
+
+logger = logging.getLogger(__name__)
+
+
+def normalise(text: str) -> str:
+    # Case is kept on purpose: "Apple" and "apple" may translate differently.
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(prompt_text: str, message_text: str, params: dict) -> str:
+    prompt_hash = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+    payload = json.dumps(
+        [prompt_hash, normalise(message_text), params],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteTier:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, feature TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> tuple[float, str] | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT expires_at, value FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+        return row
+
+    def put(self, key: str, feature: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, feature, value, expires_at) VALUES (?, ?, ?, ?)",
+                (key, feature, value, expires_at),
+            )
+            self._db.execute("DELETE FROM completions WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class CompletionCache:
+    # Two tiers: an in-memory LRU in front of an optional SQLite file that
+    # survives restarts. Only features with a positive TTL are cached.
+
+    def __init__(
+        self,
+        max_entries: int = COMPLETION_CACHE_SIZE,
+        ttls: dict[str, float] = COMPLETION_CACHE_TTLS,
+        db_path: str | None = COMPLETION_CACHE_DB,
+    ):
+        self.max_entries = max_entries
+        self.ttls = ttls
+        self.db_path = db_path
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._disk: SQLiteTier | None = None
+        self.counters: dict[str, dict[str, int]] = {}
+        self.evictions = 0
+
+    def ttl(self, feature: str) -> float:
+        # "translator/en" falls back to the TTL configured for "translator".
+        return self.ttls.get(feature, self.ttls.get(feature.split("/", 1)[0], 0))
+
+    def enabled(self, feature: str | None) -> bool:
+        return feature is not None and self.ttl(feature) > 0
+
+    def _count(self, feature: str, outcome: str) -> None:
+        counters = self.counters.setdefault(feature, {"hits": 0, "disk_hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def _get_disk(self) -> SQLiteTier | None:
+        if self._disk is None and self.db_path:
+            try:
+                self._disk = SQLiteTier(self.db_path)
+            except sqlite3.Error as e:
+                logger.warning("Completion cache database %s unavailable: %s", self.db_path, e)
+                self.db_path = None
+        return self._disk
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, feature: str, key: str) -> str | None:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                self._count(feature, "hits")
+                return entry[1]
+            del self._memory[key]
+
+        disk = self._get_disk()
+        if disk is not None:
+            try:
+                row = await asyncio.to_thread(disk.get, key)
+            except sqlite3.Error as e:
+                logger.warning("Completion cache read failed: %s", e)
+                row = None
+            if row is not None and row[0] > now:
+                self._remember(key, row[0], row[1])
+                self._count(feature, "disk_hits")
+                return row[1]
+
+        self._count(feature, "misses")
+        return None
+
+    async def put(self, feature: str, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl(feature)
+        self._remember(key, expires_at, value)
+        disk = self._get_disk()
+        if disk is not None:
+            try:
+                await asyncio.to_thread(disk.put, key, feature, value, expires_at)
+            except sqlite3.Error as e:
+                logger.warning("Completion cache write failed: %s", e)
+
+    def stats(self) -> dict:
+        totals = {
+            outcome: sum(counters[outcome] for counters in self.counters.values())
+            for outcome in ("hits", "disk_hits", "misses")
+        }
+        lookups = sum(totals.values())
+        return {
+            "entries": len(self._memory),
+            "evictions": self.evictions,
+            **totals,
+            "hit_ratio": round((totals["hits"] + totals["disk_hits"]) / lookups, 3) if lookups else 0.0,
+            "features": self.counters,
+        }
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+
+completion_cache = CompletionCache()
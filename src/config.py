@@ -3,5 +3,95 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _parse_mapping(value: str) -> dict[str, float]:
+    # "translator=604800,random=0" -> {"translator": 604800.0, "random": 0.0}
+    mapping = {}
+    for item in value.split(","):
+        if "=" in item:
+            key, _, number = item.partition("=")
+            mapping[key.strip()] = float(number)
+    return mapping
+
+
 CHATGPT_TOKEN = os.getenv("CHATGPT_TOKEN")
-BOT_TOKEN = os.getenv("BOT_TOKEN")
\ No newline at end of file
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL") or "https://api.telegram.org/bot"
+BOT_API_FILE_URL = os.getenv("BOT_API_FILE_URL") or "https://api.telegram.org/file/bot"
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_PROXY = os.getenv("OPENAI_PROXY", "http://18.199.183.77:49232") or None
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "0").lower() in ("1", "true", "yes")
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "32"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+OPENAI_REQUESTS_PER_MIN = float(os.getenv("OPENAI_REQUESTS_PER_MIN", "3500"))
+OPENAI_TOKENS_PER_MIN = float(os.getenv("OPENAI_TOKENS_PER_MIN", "90000"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "20"))
+OPENAI_PROMPT_CACHE_KEY = os.getenv("OPENAI_PROMPT_CACHE_KEY", "1").lower() in ("1", "true", "yes")
+
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", "3600"))
+CONVERSATION_MAX_BYTES = int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+SUMMARY_RETRY_COOLDOWN = float(os.getenv("SUMMARY_RETRY_COOLDOWN", "60"))
+MODEL_FALLBACK_COOLDOWN = float(os.getenv("MODEL_FALLBACK_COOLDOWN", "60"))
+
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+PLACEHOLDER_DELAY = float(os.getenv("PLACEHOLDER_DELAY", "0.7"))
+
+IMAGE_CACHE_PATH = os.getenv("IMAGE_CACHE_PATH", os.path.join("data", "image_file_ids.json"))
+
+RESOURCE_RELOAD_INTERVAL = float(os.getenv("RESOURCE_RELOAD_INTERVAL", "5"))
+
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL") or None
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "2"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+UPDATE_MAX_PENDING = int(os.getenv("UPDATE_MAX_PENDING", "4096"))
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", "32"))
+
+RESUME_PHOTO_MAX_BYTES = int(os.getenv("RESUME_PHOTO_MAX_BYTES", str(10 * 1024 * 1024)))
+RESUME_PDF_MAX_BYTES = int(os.getenv("RESUME_PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+
+RESUME_PHOTO_DPI = int(os.getenv("RESUME_PHOTO_DPI", "200"))
+PHOTO_CACHE_MAX_BYTES = int(os.getenv("PHOTO_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+COMPLETION_CACHE_SIZE = int(os.getenv("COMPLETION_CACHE_SIZE", "2048"))
+COMPLETION_CACHE_DB = os.getenv("COMPLETION_CACHE_DB") or None
+COMPLETION_CACHE_TTLS = _parse_mapping(os.getenv("COMPLETION_CACHE_TTLS", "translator=604800"))
+RANDOM_POOL_SIZE = int(os.getenv("RANDOM_POOL_SIZE", "5"))
+
+TRANSLATION_SEGMENT_CHARS = int(os.getenv("TRANSLATION_SEGMENT_CHARS", "1500"))
+TRANSLATION_PARALLELISM = int(os.getenv("TRANSLATION_PARALLELISM", "4"))
+
+TELEGRAM_GLOBAL_PER_SEC = float(os.getenv("TELEGRAM_GLOBAL_PER_SEC", "30"))
+TELEGRAM_CHAT_PER_MIN = float(os.getenv("TELEGRAM_CHAT_PER_MIN", "60"))
+TELEGRAM_GROUP_PER_MIN = float(os.getenv("TELEGRAM_GROUP_PER_MIN", "20"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite").lower()
+STATE_DB = os.getenv("STATE_DB", "data/state.sqlite3")
+STATE_REDIS_URL = os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0")
+STATE_TTL = float(os.getenv("STATE_TTL", str(30 * 24 * 3600)))
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "5"))
+DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "0").lower() in ("1", "true", "yes")
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE") or None
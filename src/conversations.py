@@ -0,0 +1,275 @@
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from typing import Hashable
+
+from config import (
+    CONVERSATION_MAX_SESSIONS,
+    CONVERSATION_TTL,
+    CONVERSATION_MAX_BYTES,
+    CONTEXT_TOKEN_BUDGET,
+    SUMMARY_RETRY_COOLDOWN,
+)
+from prefixes import prefix_cache
+from tokens import count_message_tokens
+
+SUMMARY_HEADER = "Короткий зміст попередньої розмови:\n"
+
+SESSION_OVERHEAD = 200
+
+
+class Session:
+    # Turns are stored flat as [user, assistant, user, assistant, ...] strings
+    # instead of one dict per message; the system prompt is interned in the
+    # store so thousands of sessions sharing a prompt keep a single copy.
+    # Token counts are kept alongside so the context window never re-counts.
+    # The prompt goes first and the summary second, so the request prefix
+    # stays byte-identical from turn to turn.
+    __slots__ = (
+        "prompt",
+        "prompt_tokens",
+        "summary",
+        "summary_tokens",
+        "turns",
+        "turn_tokens",
+        "size",
+        "touched",
+        "folding",
+    )
+
+    def __init__(self, prompt: str | None):
+        self.prompt = prompt
+        self.prompt_tokens = prefix_cache.get(prompt).tokens if prompt is not None else 0
+        self.summary: str | None = None
+        self.summary_tokens = 0
+        self.turns: list[str] = []
+        self.turn_tokens = array("I")
+        self.size = SESSION_OVERHEAD
+        self.touched = time.monotonic()
+        self.folding = False
+
+    def window_start(self, budget: int) -> int:
+        used = self.prompt_tokens + self.summary_tokens
+        start = len(self.turns)
+        while start >= 2:
+            pair = self.turn_tokens[start - 2] + self.turn_tokens[start - 1]
+            if used + pair > budget:
+                break
+            used += pair
+            start -= 2
+        return start
+
+    def messages(self, budget: int) -> list[dict]:
+        messages = []
+        if self.prompt is not None:
+            messages.append(prefix_cache.get(self.prompt).message)
+        if self.summary is not None:
+            messages.append({"role": "system", "content": SUMMARY_HEADER + self.summary})
+        for index in range(self.window_start(budget), len(self.turns)):
+            role = "user" if index % 2 == 0 else "assistant"
+            messages.append({"role": role, "content": self.turns[index]})
+        return messages
+
+
+class ConversationStore:
+    def __init__(
+        self,
+        max_sessions: int = CONVERSATION_MAX_SESSIONS,
+        ttl: float = CONVERSATION_TTL,
+        max_bytes: int = CONVERSATION_MAX_BYTES,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        fold_cooldown: float = SUMMARY_RETRY_COOLDOWN,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.token_budget = token_budget
+        self.fold_cooldown = fold_cooldown
+        # A failed summary usually means upstream is down, so no session
+        # starts another one until this time.
+        self.fold_paused_until = 0.0
+        self.fold_failures = 0
+        self.size = 0
+        self.evictions = 0
+        self._sessions: OrderedDict[Hashable, Session] = OrderedDict()
+        self._prompts: dict[str, str] = {}
+        # Sessions changed since the last persistence run.
+        self.dirty: set[Hashable] = set()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: Hashable) -> bool:
+        return self._get(session_id) is not None
+
+    def _get(self, session_id: Hashable) -> Session | None:
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.touched = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _intern(self, prompt: str) -> str:
+        return self._prompts.setdefault(prompt, prompt)
+
+    def _resize(self, session: Session, delta: int) -> None:
+        session.size += delta
+        self.size += delta
+
+    def _remove(self, session_id: Hashable) -> None:
+        session = self._sessions.pop(session_id)
+        self.size -= session.size
+
+    def _expire(self) -> None:
+        # Sessions are kept in least-recently-used order, so expired ones are
+        # always at the head and eviction never scans live sessions.
+        deadline = time.monotonic() - self.ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.touched > deadline:
+                break
+            self._remove(session_id)
+            self.evictions += 1
+
+    def _enforce_limits(self, keep: Hashable) -> None:
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self.size > self.max_bytes
+        ):
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                break
+            self._remove(session_id)
+            self.evictions += 1
+        if len(self._prompts) > self.max_sessions:
+            live = {session.prompt for session in self._sessions.values()}
+            self._prompts = {prompt: prompt for prompt in live if prompt is not None}
+
+    def prompt(self, session_id: Hashable) -> str | None:
+        session = self._get(session_id)
+        return session.prompt if session else None
+
+    def set_prompt(self, session_id: Hashable, prompt_text: str) -> None:
+        self.clear(session_id)
+        self._sessions[session_id] = Session(self._intern(prompt_text))
+        self.size += SESSION_OVERHEAD
+        self.dirty.add(session_id)
+        self._enforce_limits(session_id)
+
+    def messages(self, session_id: Hashable, reserve: int = 0) -> list[dict]:
+        session = self._get(session_id)
+        return session.messages(self.token_budget - reserve) if session else []
+
+    def append(self, session_id: Hashable, user_text: str, reply_text: str) -> None:
+        session = self._get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Session(None)
+            self.size += SESSION_OVERHEAD
+        session.turns.append(user_text)
+        session.turns.append(reply_text)
+        session.turn_tokens.append(count_message_tokens(user_text))
+        session.turn_tokens.append(count_message_tokens(reply_text))
+        self._resize(session, sys.getsizeof(user_text) + sys.getsizeof(reply_text) + 8)
+        self.dirty.add(session_id)
+        self._enforce_limits(session_id)
+
+    def begin_fold(self, session_id: Hashable) -> tuple[Session, int, list[dict]] | None:
+        # Once the history outgrows the budget, everything except the turns
+        # that fit into half of it is handed out for summarisation, so a fold
+        # only happens every few turns rather than on each one.
+        session = self._sessions.get(session_id)
+        if session is None or session.folding or time.monotonic() < self.fold_paused_until:
+            return None
+        if session.window_start(self.token_budget) == 0:
+            return None
+        end = session.window_start(self.token_budget // 2)
+        if end == 0:
+            return None
+        session.folding = True
+        turns = [
+            {"role": "user" if index % 2 == 0 else "assistant", "content": session.turns[index]}
+            for index in range(end)
+        ]
+        return session, end, turns
+
+    def finish_fold(
+        self,
+        session_id: Hashable,
+        session: Session,
+        end: int,
+        summary: str | None,
+    ) -> None:
+        session.folding = False
+        if summary is None:
+            self.fold_failures += 1
+            self.fold_paused_until = time.monotonic() + self.fold_cooldown
+            return
+        if self._sessions.get(session_id) is not session:
+            return
+        removed = session.turns[:end]
+        del session.turns[:end]
+        del session.turn_tokens[:end]
+        delta = sys.getsizeof(summary)
+        if session.summary is not None:
+            delta -= sys.getsizeof(session.summary)
+        session.summary = summary
+        session.summary_tokens = count_message_tokens(SUMMARY_HEADER + summary)
+        delta -= sum(sys.getsizeof(text) + 4 for text in removed)
+        self._resize(session, delta)
+        self.dirty.add(session_id)
+
+    def clear(self, session_id: Hashable) -> None:
+        if session_id in self._sessions:
+            self._remove(session_id)
+            self.dirty.add(session_id)
+
+    def export(self, session_id: Hashable) -> tuple | None:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        return (
+            session.prompt,
+            session.prompt_tokens,
+            session.summary,
+            session.summary_tokens,
+            list(session.turns),
+            session.turn_tokens.tobytes(),
+        )
+
+    def drain(self) -> dict[Hashable, tuple | None]:
+        # Snapshots of the sessions changed since the last call; None means
+        # the session is gone.
+        changed = {session_id: self.export(session_id) for session_id in self.dirty}
+        self.dirty.clear()
+        return changed
+
+    def restore(self, session_id: Hashable, state: tuple) -> None:
+        prompt, prompt_tokens, summary, summary_tokens, turns, turn_tokens = state
+        session = Session(None)
+        session.prompt = self._intern(prompt) if prompt is not None else None
+        session.prompt_tokens = prompt_tokens
+        session.summary = summary
+        session.summary_tokens = summary_tokens
+        session.turns = turns
+        session.turn_tokens.frombytes(turn_tokens)
+        session.size += sum(sys.getsizeof(text) + 4 for text in turns)
+        if summary is not None:
+            session.size += sys.getsizeof(summary)
+        self.clear(session_id)
+        self.dirty.discard(session_id)
+        self._sessions[session_id] = session
+        self.size += session.size
+        self._enforce_limits(session_id)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self.size,
+            "prompts": len(self._prompts),
+            "evictions": self.evictions,
+            "fold_failures": self.fold_failures,
+        }
+
+
+conversation_store = ConversationStore()
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from collections import deque
+
+from config import RANDOM_POOL_SIZE
+from ratelimit import PRIORITY_INTERACTIVE, PRIORITY_PREFETCH
+from utils import load_prompt
+
+logger = logging.getLogger(__name__)
+
+RANDOM_QUESTION = "Розкажи про випадковий факт"
+
+
+class FactPool:
+    # Keeps a few /random facts ready so a button press is answered from
+    # memory; every fact handed out triggers a background top-up. Each fact is
+    # served once, and facts seen recently are not queued again.
+
+    def __init__(self, service, size: int = RANDOM_POOL_SIZE):
+        self.service = service
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._facts: deque[str] = deque()
+        self._recent: deque[str] = deque(maxlen=100)
+        self._refill_task: asyncio.Task | None = None
+
+    async def _fetch(self, priority: int = PRIORITY_INTERACTIVE) -> str:
+        return await self.service.send_question(
+            prompt_text=load_prompt("random"),
+            message_text=RANDOM_QUESTION,
+            feature="random",
+            priority=priority,
+        )
+
+    async def get(self) -> str:
+        if self._facts:
+            self.hits += 1
+            fact = self._facts.popleft()
+        else:
+            self.misses += 1
+            fact = await self._fetch()
+            # A prefetch may have queued the same fact in the meantime.
+            if fact in self._facts:
+                self._facts.remove(fact)
+        self._recent.append(fact)
+        self.refill()
+        return fact
+
+    def refill(self) -> None:
+        if self.size <= 0 or len(self._facts) >= self.size:
+            return
+        if self._refill_task is not None and not self._refill_task.done():
+            return
+        self._refill_task = asyncio.create_task(self._fill())
+
+    async def _fill(self) -> None:
+        attempts = 0
+        while len(self._facts) < self.size and attempts < self.size * 2:
+            attempts += 1
+            try:
+                fact = await self._fetch(PRIORITY_PREFETCH)
+            except Exception as e:
+                logger.warning(f"Could not prefetch a random fact: {e}")
+                return
+            if fact in self._recent or fact in self._facts:
+                continue
+            self._facts.append(fact)
+
+    def stats(self) -> dict:
+        return {"ready": len(self._facts), "hits": self.hits, "misses": self.misses}
+
+    async def close(self) -> None:
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._refill_task = None
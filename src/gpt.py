@@ -1,39 +1,310 @@
-from openai import OpenAI
-import httpx
+import time
+import asyncio
+import logging
+from typing import TYPE_CHECKING, AsyncIterator, Hashable
+
+from config import OPENAI_TIMEOUT, OPENAI_MAX_RETRIES, OPENAI_PROMPT_CACHE_KEY
+from conversations import ConversationStore, Session, conversation_store
+from completion_cache import CompletionCache, cache_key, completion_cache
+from singleflight import SingleFlight
+from transport import get_openai_client
+from metrics import observe_stage, timed
+from models import FIRST_TOKEN, REQUEST, model_router
+from prefixes import prefix_cache
+from ratelimit import (
+    PRIORITY_INTERACTIVE,
+    PRIORITY_PREFETCH,
+    backoff_delay,
+    request_limiter,
+)
+from tokens import count_message_tokens
+from utils import load_prompt
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+_background_tasks: set[asyncio.Task] = set()
+flights = SingleFlight()
+
+
+def _retryable(error: Exception) -> bool:
+    # openai is loaded lazily (see transport.py); once one of its errors is
+    # being handled the import is only a sys.modules lookup.
+    import openai
+    if isinstance(error, openai.APITimeoutError):
+        # The request has used up its whole timeout already; retrying would
+        # hold the chat for several more.
+        return False
+    if isinstance(error, openai.RateLimitError):
+        # An exhausted quota does not come back by waiting.
+        return error.code != "insufficient_quota"
+    return isinstance(error, (openai.APIConnectionError, openai.InternalServerError))
+
+
+def _request_options(messages: list, route) -> tuple[int, dict]:
+    # Token estimate for the limiter and the prompt-cache options. A leading
+    # system prompt from the prefix cache is already counted.
+    prefix = prefix_cache.lookup(messages)
+    rest = messages[1:] if prefix is not None else messages
+    estimate = sum(count_message_tokens(message["content"]) for message in rest) + route.max_tokens
+    options = {}
+    if prefix is not None:
+        estimate += prefix.tokens
+        if OPENAI_PROMPT_CACHE_KEY:
+            options["prompt_cache_key"] = prefix.key
+    return estimate, options
+
+
+async def _retry_pause(error: Exception, attempt: int) -> None:
+    # Rate limits pause the whole limiter until upstream's reset, so queued
+    # requests wait too instead of hitting the same 429.
+    response = getattr(error, "response", None)
+    retry_after = None
+    if getattr(error, "status_code", None) == 429:
+        retry_after = request_limiter.pause(response.headers if response is not None else None)
+    request_limiter.retries += 1
+    delay = backoff_delay(attempt, retry_after)
+    logger.warning(f"OpenAI request failed ({type(error).__name__}), retry {attempt + 1} in {delay:.1f}s")
+    await asyncio.sleep(delay)
 
 
 class ChatGPTService:
-    client: OpenAI = None
-    message_list: list = None
-
-    def __init__(self, token):
-        self.client = OpenAI(
-            http_client=httpx.Client(proxy="http://18.199.183.77:49232"),
-            api_key=token
-        )
-        self.message_list = []
-
-    async def send_message_list(self) -> str:
-        completion = self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=self.message_list,
-            max_tokens=3000,
-            temperature=0.9
-        )
-        message = completion.choices[0].message
-        self.message_list.append(message)
-        return message.content
-
-    def set_prompt(self, prompt_text: str) -> None:
-        self.message_list.clear()
-        self.message_list.append({"role": "system", "content": prompt_text})
-
-    async def add_message(self, message_text: str) -> str:
-        self.message_list.append({"role": "user", "content": message_text})
-        return await self.send_message_list()
-
-    async def send_question(self, prompt_text: str, message_text: str) -> str:
-        self.message_list.clear()
-        self.message_list.append({"role": "system", "content": prompt_text})
-        self.message_list.append({"role": "user", "content": message_text})
-        return await self.send_message_list()
+    store: ConversationStore = None
+    cache: CompletionCache = None
+
+    def __init__(
+        self,
+        token,
+        store: ConversationStore | None = None,
+        cache: CompletionCache | None = None,
+    ):
+        self.token = token
+        self.store = store if store is not None else conversation_store
+        self.cache = cache if cache is not None else completion_cache
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        return get_openai_client(self.token)
+
+    async def _complete(
+        self,
+        messages: list,
+        feature: str | None = None,
+        timeout: float | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        answered_by: list[str] | None = None,
+    ) -> str:
+        # `answered_by`, if given, receives the model that produced the reply.
+        estimate, options = _request_options(messages, model_router.route(feature))
+        attempt = 0
+        while True:
+            route, model = model_router.select(feature)
+            async with request_limiter.slot(estimate, priority) as permit:
+                requested = time.perf_counter()
+                try:
+                    with timed("openai_request"):
+                        response = await self.client.chat.completions.with_raw_response.create(
+                            model=model,
+                            messages=messages,
+                            max_tokens=route.max_tokens,
+                            temperature=route.temperature,
+                            timeout=timeout or OPENAI_TIMEOUT,
+                            **options,
+                        )
+                except Exception as e:
+                    if not _retryable(e) or attempt >= OPENAI_MAX_RETRIES:
+                        raise
+                    error = e
+                else:
+                    model_router.observe_latency(route, model, time.perf_counter() - requested, REQUEST)
+                    request_limiter.observe(response.headers)
+                    completion = response.parse()
+                    if completion.usage is not None:
+                        permit.settle(completion.usage.total_tokens)
+                        model_router.record_usage(feature, model, completion.usage)
+                    if answered_by is not None:
+                        answered_by.append(model)
+                    return completion.choices[0].message.content
+            await _retry_pause(error, attempt)
+            attempt += 1
+
+    async def _stream(
+        self,
+        messages: list,
+        feature: str | None = None,
+        timeout: float | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        answered_by: list[str] | None = None,
+    ) -> AsyncIterator[str]:
+        estimate, options = _request_options(messages, model_router.route(feature))
+        attempt = 0
+        while True:
+            route, model = model_router.select(feature)
+            started = False
+            async with request_limiter.slot(estimate, priority) as permit:
+                requested = time.perf_counter()
+                try:
+                    response = await self.client.chat.completions.with_raw_response.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=route.max_tokens,
+                        temperature=route.temperature,
+                        timeout=timeout or OPENAI_TIMEOUT,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        **options,
+                    )
+                    request_limiter.observe(response.headers)
+                    async with response.parse() as stream:
+                        async for chunk in stream:
+                            if chunk.usage is not None:
+                                permit.settle(chunk.usage.total_tokens)
+                                model_router.record_usage(feature, model, chunk.usage)
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                if not started:
+                                    first_token = time.perf_counter() - requested
+                                    observe_stage("openai_first_token", first_token)
+                                    model_router.observe_latency(route, model, first_token, FIRST_TOKEN)
+                                    started = True
+                                yield chunk.choices[0].delta.content
+                    observe_stage("openai_request", time.perf_counter() - requested)
+                    if answered_by is not None:
+                        answered_by.append(model)
+                    return
+                except Exception as e:
+                    # Once text has reached the user a retry would repeat it.
+                    if started or not _retryable(e) or attempt >= OPENAI_MAX_RETRIES:
+                        raise
+                    error = e
+            await _retry_pause(error, attempt)
+            attempt += 1
+
+    def _schedule_fold(self, session_id: Hashable) -> None:
+        fold = self.store.begin_fold(session_id)
+        if fold is None:
+            return
+        task = asyncio.create_task(self._fold(session_id, *fold))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def _fold(self, session_id: Hashable, session: Session, end: int, turns: list[dict]) -> None:
+        summary = None
+        try:
+            transcript = "\n".join(
+                f"{'Користувач' if turn['role'] == 'user' else 'Асистент'}: {turn['content']}"
+                for turn in turns
+            )
+            if session.summary:
+                transcript = f"Попередній зміст:\n{session.summary}\n\nНові репліки:\n{transcript}"
+            summary = await self._complete(
+                [
+                    prefix_cache.get(load_prompt("summary")).message,
+                    {"role": "user", "content": transcript},
+                ],
+                "summary",
+                priority=PRIORITY_PREFETCH,
+            )
+        except Exception as e:
+            logger.error(f"Conversation summary failed: {e}")
+        finally:
+            self.store.finish_fold(session_id, session, end, summary)
+
+    def set_prompt(self, session_id: Hashable, prompt_text: str) -> None:
+        self.store.set_prompt(session_id, prompt_text)
+
+    def ensure_prompt(self, session_id: Hashable, prompt_text: str) -> None:
+        if self.store.prompt(session_id) != prompt_text:
+            self.store.set_prompt(session_id, prompt_text)
+
+    async def add_message(
+        self,
+        session_id: Hashable,
+        message_text: str,
+        feature: str = "gpt",
+        timeout: float | None = None,
+    ) -> str:
+        messages = self.store.messages(session_id, reserve=count_message_tokens(message_text))
+        messages.append({"role": "user", "content": message_text})
+        # History is only extended once the reply arrives, so a cancelled or
+        # failed request does not leave a dangling user turn behind.
+        content = await self._complete(messages, feature, timeout)
+        self.store.append(session_id, message_text, content)
+        self._schedule_fold(session_id)
+        return content
+
+    async def stream_message(
+        self,
+        session_id: Hashable,
+        message_text: str,
+        feature: str = "gpt",
+        timeout: float | None = None,
+    ) -> AsyncIterator[str]:
+        messages = self.store.messages(session_id, reserve=count_message_tokens(message_text))
+        messages.append({"role": "user", "content": message_text})
+        parts = []
+        async for delta in self._stream(messages, feature, timeout):
+            parts.append(delta)
+            yield delta
+        self.store.append(session_id, message_text, "".join(parts))
+        self._schedule_fold(session_id)
+
+    async def stream_question(
+        self,
+        prompt_text: str,
+        message_text: str,
+        timeout: float | None = None,
+        feature: str | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> AsyncIterator[str]:
+        route = model_router.route(feature)
+        key = cache_key(prompt_text, message_text, route.params)
+        use_cache = self.cache.enabled(feature)
+        if use_cache:
+            cached = await self.cache.get(feature, key)
+            if cached is not None:
+                yield cached
+                return
+        messages = [prefix_cache.get(prompt_text).message, {"role": "user", "content": message_text}]
+
+        async def fetch() -> AsyncIterator[str]:
+            parts, answered_by = [], []
+            async for delta in self._stream(messages, feature, timeout, priority=priority, answered_by=answered_by):
+                parts.append(delta)
+                yield delta
+            # The key names the primary model, so fallback answers are not kept.
+            if use_cache and answered_by == [route.model]:
+                await self.cache.put(feature, key, "".join(parts))
+
+        async for delta in flights.stream(("stream", key), fetch):
+            yield delta
+
+    async def send_question(
+        self,
+        prompt_text: str,
+        message_text: str,
+        timeout: float | None = None,
+        feature: str | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> str:
+        route = model_router.route(feature)
+        key = cache_key(prompt_text, message_text, route.params)
+        use_cache = self.cache.enabled(feature)
+        if use_cache:
+            cached = await self.cache.get(feature, key)
+            if cached is not None:
+                return cached
+        messages = [prefix_cache.get(prompt_text).message, {"role": "user", "content": message_text}]
+
+        async def fetch() -> str:
+            answered_by = []
+            content = await self._complete(messages, feature, timeout, priority=priority, answered_by=answered_by)
+            # The key names the primary model, so fallback answers are not kept.
+            if use_cache and answered_by == [route.model]:
+                await self.cache.put(feature, key, content)
+            return content
+
+        # Keyed by priority too, so a user's request never joins a background
+        # prefetch and waits behind bulk work at its priority.
+        return await flights.do((key, priority), fetch)
@@ -4,8 +4,7 @@ from random import choice
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from resume import message_handler_resume
-from translator import translator, handle_translation
+from translator import translator
 from talk import talk
 from utils import (
     send_image,
@@ -14,21 +13,19 @@ from utils import (
     show_main_menu,
     load_prompt,
     send_text_buttons,
+    send_streamed_text,
+    session_key,
+    DeferredPlaceholder,
 )
 
 from gpt import ChatGPTService
+from facts import FactPool
+from intents import intents
+from router import router
 from config import CHATGPT_TOKEN
 
 chatgpt_service = ChatGPTService(CHATGPT_TOKEN)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+fact_pool = FactPool(chatgpt_service)
 
 logger = logging.getLogger(__name__)
 
@@ -55,155 +52,85 @@ async def random(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
     context.user_data.pop("conversation_state", None)
     await send_image(update, context, "random")
-    message_to_delete = await send_text(update, context, "Шукаю випадковий факт ...")
-    try:
-        prompt = load_prompt("random")
-        fact = await chatgpt_service.send_question(
-            prompt_text=prompt,
-            message_text="Розкажи про випадковий факт"
-        )
-        buttons = {
-            'random': 'Хочу ще один факт',
-            'start': 'Закінчити'
-        }
-        await send_text_buttons(update, context, fact, buttons)
-    except Exception as e:
-        logger.error(f"Помилка в обробнику /random: {e}")
-        await send_text(update, context, "Помилка при отриманні випадкового факту.")
-    finally:
-        await context.bot.delete_message(
-            chat_id=update.effective_chat.id,
-            message_id=message_to_delete.message_id
-        )
-
+    async with DeferredPlaceholder(context, update.effective_chat.id, "Шукаю випадковий факт ...") as placeholder:
+        try:
+            fact = await fact_pool.get()
+            await placeholder.discard()
+            buttons = {
+                'random': 'Хочу ще один факт',
+                'start': 'Закінчити'
+            }
+            await send_text_buttons(update, context, fact, buttons)
+        except Exception as e:
+            logger.error(f"Помилка в обробнику /random: {e}")
+            await send_text(update, context, "Помилка при отриманні випадкового факту.")
+
+@router.callback("random")
 async def random_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
-    data = query.data
-    if data == 'random':
-        await random(update, context)
-    elif data == 'start':
-        await start(update, context)
+    await random(update, context)
+
+
+@router.callback("start")
+async def start_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    await start(update, context)
 
 async def gpt(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
     await send_image(update, context, "gpt")
-    chatgpt_service.set_prompt(load_prompt("gpt"))
+    chatgpt_service.set_prompt(session_key(update), load_prompt("gpt"))
     await send_text(update, context, "Задайте питання ...")
     context.user_data["conversation_state"] = "gpt"
 
 
-async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    conversation_state = context.user_data.get("conversation_state")
+async def reply_streamed(update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str):
+    await send_streamed_text(
+        update,
+        context,
+        chatgpt_service.stream_message(session_key(update), message_text),
+    )
 
-    if not update.message or not update.message.text:
-        if conversation_state == "resume":
-            await message_handler_resume(update, context)
-        return
 
-    message_text = update.message.text
+@router.state("gpt")
+async def gpt_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # The session may have expired while the chat stayed in /gpt mode.
+    chatgpt_service.ensure_prompt(session_key(update), load_prompt("gpt"))
+    await reply_streamed(update, context, update.message.text)
 
-    if conversation_state == "gpt":
-        waiting_message = await send_text(update, context, "...")
-        try:
-            response = await chatgpt_service.add_message(message_text)
-            await send_text(update, context, response)
-        finally:
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=waiting_message.message_id
-            )
-        return
-
-    if conversation_state == "talk":
-        personality = context.user_data.get("selected_personality")
-        if not personality:
-            await send_text(update, context, "Спочатку оберіть особистість для розмови!")
-            return
-
-        prompt = load_prompt(personality)
-        chatgpt_service.set_prompt(prompt)
-
-        waiting_message = await send_text(update, context, "...")
-        try:
-            response = await chatgpt_service.add_message(message_text)
-            await send_text(update, context, response)
-        finally:
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=waiting_message.message_id
-            )
-        return
-
-    if conversation_state == "translator":
-        await handle_translation(update, context)
-        return
-
-    if conversation_state == "resume":
-        await message_handler_resume(update, context)
-        return
-
-    intent_recognized = await inter_random_input(update, context, message_text)
+
+@router.fallback("intent")
+async def unrecognised_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    intent_recognized = await inter_random_input(update, context, update.message.text)
     if not intent_recognized:
         await show_funny_response(update, context)
 
 
+INTENT_ACTIONS = {
+    "random": ("Схоже, ви цікавитесь випадковими фактами! Зараз покажу вам один...", random),
+    "gpt": ("Схоже, у вас є питання! Переходимо до режиму спілкування з ChatGPT...", gpt),
+    "talk": ("Схоже, ви хочете поговорити з відомою особистістю! Зараз покажу вам доступні варіанти...", talk),
+    "translator": ("Схоже, ви хочете перекласти текст. Оберіть мову перекладу 👇", translator),
+}
+
+
 async def inter_random_input(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
     message_text: str
 ) -> bool:
-    message_text_lower = message_text.lower()
-
-    if any(keyword in message_text_lower for keyword in [
-        'факт', 'цікав', 'random', 'випадков'
-    ]):
-        await send_text(
-            update,
-            context,
-            "Схоже, ви цікавитесь випадковими фактами! Зараз покажу вам один..."
-        )
-        await random(update, context)
-        return True
-
-    elif any(keyword in message_text_lower for keyword in [
-        'gpt', 'чат', 'питання', 'запита', 'дізнатися'
-    ]):
-        await send_text(
-            update,
-            context,
-            "Схоже, у вас є питання! Переходимо до режиму спілкування з ChatGPT..."
-        )
-        await gpt(update, context)
-        return True
-
-    elif any(keyword in message_text_lower for keyword in [
-        'розмов', 'говори', 'спілкува', 'особист', 'talk'
-    ]):
-        await send_text(
-            update,
-            context,
-            "Схоже, ви хочете поговорити з відомою особистістю! Зараз покажу вам доступні варіанти..."
-        )
-        await talk(update, context)
-        return True
-
-    elif any(keyword in message_text_lower for keyword in [
-        'переведи', 'перевод', 'переклади',
-        'translate', 'translation',
-        'на англий', 'на англій',
-        'на немец', 'на німец',
-        'translator'
-    ]):
-        await send_text(
-            update,
-            context,
-            "Схоже, ви хочете перекласти текст. Оберіть мову перекладу 👇"
-        )
-        await translator(update, context)
-        return True
-
-    return False
+    scores = intents.scores(message_text)
+    # Highest score wins; ties go to the intent listed first above.
+    intent = max(INTENT_ACTIONS, key=lambda name: scores.get(name, 0))
+    if scores.get(intent, 0) <= 0:
+        return False
+
+    reply, action = INTENT_ACTIONS[intent]
+    await send_text(update, context, reply)
+    await action(update, context)
+    return True
 
 
 async def show_funny_response(update: Update, context: ContextTypes.DEFAULT_TYPE):
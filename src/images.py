@@ -0,0 +1,108 @@
+import os
+import json
+import logging
+import tempfile
+
+from config import IMAGE_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'images')
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+class ImageRegistry:
+    def __init__(self, images_dir: str = IMAGES_DIR, cache_path: str = IMAGE_CACHE_PATH):
+        self.images_dir = images_dir
+        self.cache_path = cache_path
+        self._paths: dict[str, str] = {}
+        self._fingerprints: dict[str, list[int]] = {}
+        self._file_ids: dict[str, dict[str, dict]] = {}
+        # Entries changed here since the last save; None marks a removal.
+        self._changes: dict[tuple[str, str], dict | None] = {}
+        self.scan()
+        self.load()
+
+    def scan(self) -> None:
+        paths = {}
+        for file_name in sorted(os.listdir(self.images_dir)):
+            name, ext = os.path.splitext(file_name)
+            if ext not in EXTENSIONS:
+                continue
+            current = paths.get(name)
+            if current is None or EXTENSIONS.index(ext) < EXTENSIONS.index(os.path.splitext(current)[1]):
+                paths[name] = os.path.join(self.images_dir, file_name)
+        self._paths = paths
+        self._fingerprints = {}
+        for name, path in paths.items():
+            stat = os.stat(path)
+            self._fingerprints[name] = [stat.st_size, stat.st_mtime_ns]
+
+    def _read(self) -> dict[str, dict[str, dict]]:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Image file_id cache %s is unreadable: %s", self.cache_path, e)
+            return {}
+
+    def load(self) -> None:
+        self._file_ids = self._read()
+
+    def save(self) -> None:
+        # Webhook workers share the file, so it is re-read and only this
+        # process's changes are applied on top, then written through a
+        # temporary file of its own and swapped in.
+        file_ids = self._read()
+        for (bot_id, name), entry in self._changes.items():
+            if entry is None:
+                file_ids.get(bot_id, {}).pop(name, None)
+            else:
+                file_ids.setdefault(bot_id, {})[name] = entry
+        directory = os.path.dirname(self.cache_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=directory,
+            prefix=os.path.basename(self.cache_path) + ".",
+            suffix=".tmp",
+            delete=False,
+        ) as file:
+            json.dump(file_ids, file, indent=2)
+        try:
+            os.replace(file.name, self.cache_path)
+        except OSError:
+            os.unlink(file.name)
+            raise
+        self._file_ids = file_ids
+        self._changes.clear()
+
+    def path(self, name: str) -> str | None:
+        return self._paths.get(name)
+
+    def file_id(self, bot_id: int, name: str) -> str | None:
+        # file_ids are only valid for the bot that uploaded the file, and an
+        # image replaced on disk must be uploaded again.
+        entry = self._file_ids.get(str(bot_id), {}).get(name)
+        if entry and entry.get("fingerprint") == self._fingerprints.get(name):
+            return entry["file_id"]
+        return None
+
+    def remember(self, bot_id: int, name: str, file_id: str) -> None:
+        entry = {"file_id": file_id, "fingerprint": self._fingerprints.get(name)}
+        self._file_ids.setdefault(str(bot_id), {})[name] = entry
+        self._changes[(str(bot_id), name)] = entry
+        try:
+            self.save()
+        except OSError as e:
+            logger.warning("Could not persist image file_id cache: %s", e)
+
+    def forget(self, bot_id: int, name: str) -> None:
+        self._file_ids.get(str(bot_id), {}).pop(name, None)
+        self._changes[(str(bot_id), name)] = None
+
+
+image_registry = ImageRegistry()
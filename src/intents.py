@@ -0,0 +1,97 @@
+import re
+import logging
+
+from resources import ResourceCatalogue, catalogue
+
+logger = logging.getLogger(__name__)
+
+
+def parse_stems(text: str) -> dict[str, float]:
+    # One stem per line, optionally followed by a weight: "переклад 2".
+    stems = {}
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        stem, _, weight = line.rpartition(" ")
+        try:
+            stems[stem.casefold()] = float(weight)
+        except ValueError:
+            stems[line.casefold()] = 1.0
+    return stems
+
+
+def trie_pattern(words) -> str:
+    # Merges the words into a character trie and writes it out as a regex,
+    # so at each position the engine follows a single branch per character
+    # instead of trying every word: the cost stays flat as words are added.
+    # Optional tails are greedy, so the longest stem wins.
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class IntentMatcher:
+    def __init__(self, intents: dict[str, dict[str, float]]):
+        self.intents = list(intents)
+        self._stems: dict[str, list[tuple[str, float]]] = {}
+        for intent, stems in intents.items():
+            for stem, weight in stems.items():
+                self._stems.setdefault(stem, []).append((intent, weight))
+        pattern = trie_pattern(self._stems) if self._stems else "(?!)"
+        self._regex = re.compile(rf"(?<!\w){pattern}")
+
+    def scores(self, text: str) -> dict[str, float]:
+        scores: dict[str, float] = {}
+        for match in self._regex.finditer(text.casefold()):
+            for intent, weight in self._stems[match.group()]:
+                scores[intent] = scores.get(intent, 0) + weight
+        return scores
+
+    def match(self, text: str) -> list[tuple[str, float]]:
+        scores = self.scores(text)
+        order = {intent: index for index, intent in enumerate(self.intents)}
+        return sorted(scores.items(), key=lambda item: (-item[1], order[item[0]]))
+
+
+class CatalogueIntents:
+    # Builds the matcher from resources/intents/*.txt and rebuilds it after
+    # the catalogue reloads, so new stems need no restart.
+
+    def __init__(self, source: ResourceCatalogue = catalogue, prefix: str = "intents/"):
+        self.source = source
+        self.prefix = prefix
+        self._version = None
+        self._matcher: IntentMatcher | None = None
+
+    @property
+    def matcher(self) -> IntentMatcher:
+        if self._version != self.source.version:
+            self._matcher = IntentMatcher({
+                key[len(self.prefix):]: parse_stems(self.source.get(key))
+                for key in sorted(self.source.keys(self.prefix))
+            })
+            self._version = self.source.version
+            logger.info("Intent matcher built for %s", ", ".join(self._matcher.intents))
+        return self._matcher
+
+    def scores(self, text: str) -> dict[str, float]:
+        return self.matcher.scores(text)
+
+    def match(self, text: str) -> list[tuple[str, float]]:
+        return self.matcher.match(text)
+
+
+intents = CatalogueIntents()
@@ -0,0 +1,38 @@
+import queue
+import logging
+import logging.handlers
+
+from config import LOG_FILE, LOG_LEVEL
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def setup_logging(level: str = LOG_LEVEL, log_file: str | None = LOG_FILE) -> None:
+    # Records go through an in-memory queue and are formatted and written by
+    # a background thread, so a slow disk or terminal never blocks the event
+    # loop.
+    global _listener
+    if _listener is not None:
+        return
+    formatter = logging.Formatter(FORMAT)
+    handlers: list[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(records)]
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
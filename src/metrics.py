@@ -0,0 +1,261 @@
+import math
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+from config import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+
+def _pick(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class LatencyStats:
+    # Keeps the most recent `size` samples; percentiles are computed on demand
+    # from that window, so recording stays O(1) on the hot path.
+
+    def __init__(self, size: int = 2048):
+        self.count = 0
+        self.total = 0.0
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self._samples.append(value)
+
+    def percentile(self, q: float) -> float:
+        return _pick(sorted(self._samples), q)
+
+    def summary(self) -> dict:
+        ordered = sorted(self._samples)
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": _pick(ordered, 0.5),
+            "p90": _pick(ordered, 0.9),
+            "p99": _pick(ordered, 0.99),
+            "max": ordered[-1] if ordered else 0.0,
+        }
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Feature ("random", "gpt", "translator", ...) of the update being handled;
+# set by `instrument` and inherited by tasks created while handling it.
+current_feature: ContextVar[str] = ContextVar("current_feature", default="none")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    # Fixed buckets, so observing is a bisect and two additions.
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class HistogramFamily:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._children: dict[tuple, Histogram] = {}
+
+    def labels(self, *values) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = Histogram(self.buckets)
+        return child
+
+    def observe(self, value: float, *values) -> None:
+        self.labels(*values).observe(value)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for values, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _labels(self.label_names, values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, values)} {child.sum}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, values)} {child.count}")
+        return lines
+
+
+class CounterFamily:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float, *values) -> None:
+        self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, values)} {total}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms: dict[str, HistogramFamily] = {}
+        self.counters: dict[str, CounterFamily] = {}
+        self.collectors: dict[str, Callable[[], dict]] = {}
+
+    def histogram(self, name: str, help_text: str, label_names: tuple[str, ...], buckets=DEFAULT_BUCKETS) -> HistogramFamily:
+        family = self.histograms.get(name)
+        if family is None:
+            family = self.histograms[name] = HistogramFamily(name, help_text, label_names, buckets)
+        return family
+
+    def counter(self, name: str, help_text: str, label_names: tuple[str, ...]) -> CounterFamily:
+        family = self.counters.get(name)
+        if family is None:
+            family = self.counters[name] = CounterFamily(name, help_text, label_names)
+        return family
+
+    def collect(self, prefix: str, stats: Callable[[], dict]) -> None:
+        # Numeric values of `stats()` are exported as gauges named
+        # "<prefix>_<key>" when the endpoint is scraped.
+        self.collectors[prefix] = stats
+
+    def render(self) -> str:
+        lines = []
+        for family in self.histograms.values():
+            lines.extend(family.render())
+        for family in self.counters.values():
+            lines.extend(family.render())
+        for prefix, stats in self.collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", prefix, e)
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HANDLER_SECONDS = registry.histogram(
+    "bot_handler_seconds", "Time spent handling one update.", ("feature",)
+)
+STAGE_SECONDS = registry.histogram(
+    "bot_stage_seconds", "Time spent in one stage of handling an update.", ("feature", "stage")
+)
+TELEGRAM_SECONDS = registry.histogram(
+    "bot_telegram_request_seconds", "Bot API call latency including throttling.", ("endpoint",)
+)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, current_feature.get(), stage)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+async def instrument(feature: str, handler, update, context):
+    token = current_feature.set(feature)
+    started = time.perf_counter()
+    try:
+        return await handler(update, context)
+    finally:
+        HANDLER_SECONDS.observe(time.perf_counter() - started, feature)
+        current_feature.reset(token)
+
+
+def instrumented(feature: str, handler):
+    async def wrapper(update, context):
+        return await instrument(feature, handler, update, context)
+    wrapper.__name__ = getattr(handler, "__name__", feature)
+    return wrapper
+
+
+class MetricsServer:
+    # Serves registry.render() as Prometheus text on GET /metrics.
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._server: asyncio.base_events.Server | None = None
+
+    async def start(self) -> None:
+        if not self.port or self._server is not None:
+            return
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Metrics available on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split(" ")
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?", 1)[0] == "/metrics":
+                status, body = "200 OK", registry.render().encode()
+            else:
+                status, body = "404 Not Found", b""
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+metrics_server = MetricsServer()
@@ -0,0 +1,167 @@
+import time
+import logging
+from typing import NamedTuple
+
+from config import MODEL_FALLBACK_COOLDOWN
+from metrics import LatencyStats, registry
+from resources import ResourceCatalogue, catalogue
+
+logger = logging.getLogger(__name__)
+
+# Latency kinds: a stream's time to first token, or a whole non-streamed
+# request. Only the first is compared with a route's SLO; a long
+# non-streamed answer takes as long as it has tokens to generate.
+FIRST_TOKEN = "first_token"
+REQUEST = "request"
+
+TOKENS = registry.counter(
+    "bot_openai_tokens_total", "Tokens used per feature and model.", ("feature", "model", "kind")
+)
+
+
+class Route(NamedTuple):
+    name: str
+    model: str
+    max_tokens: int
+    temperature: float
+    fallback: str | None = None
+    slo: float | None = None
+
+    @property
+    def params(self) -> dict:
+        return {"model": self.model, "max_tokens": self.max_tokens, "temperature": self.temperature}
+
+
+def parse_routes(text: str) -> dict[str, Route]:
+    # One route per line: feature, model, max_tokens, temperature and
+    # optionally a fallback model and its latency SLO in seconds ("-" for
+    # none).
+    routes = {}
+    for line in text.splitlines():
+        fields = line.split("#", 1)[0].split()
+        if not fields:
+            continue
+        if len(fields) not in (4, 6):
+            raise ValueError(f"Route {line.strip()!r} needs 4 or 6 columns")
+        name, model, max_tokens, temperature = fields[:4]
+        fallback, slo = fields[4:] or ("-", "-")
+        routes[name] = Route(
+            name,
+            model,
+            int(max_tokens),
+            float(temperature),
+            None if fallback == "-" else fallback,
+            None if slo == "-" else float(slo),
+        )
+    if "default" not in routes:
+        raise ValueError("The routing table needs a 'default' route")
+    return routes
+
+
+class ModelRouter:
+    # Picks model, max_tokens and temperature per feature from
+    # resources/models/routes.txt. "translator/en" falls back to the
+    # "translator" route, "talk_linus_torvalds" to "talk", anything else to
+    # "default".
+    #
+    # Routes with a fallback model watch the latency of their primary model,
+    # in one window per latency kind. When the recent p90 time to first token
+    # exceeds the SLO the fallback is used for `cooldown` seconds, then the
+    # primary is tried again with a fresh window.
+
+    def __init__(
+        self,
+        source: ResourceCatalogue = catalogue,
+        key: str = "models/routes",
+        cooldown: float = MODEL_FALLBACK_COOLDOWN,
+        min_samples: int = 10,
+    ):
+        self.source = source
+        self.key = key
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self._version = None
+        self._routes: dict[str, Route] = {}
+        self._latency: dict[tuple[str, str], LatencyStats] = {}
+        self._degraded_until: dict[str, float] = {}
+        self.fallbacks = 0
+        self.usage: dict[str, dict[str, int]] = {}
+
+    @property
+    def routes(self) -> dict[str, Route]:
+        if self._version != self.source.version:
+            try:
+                self._routes = parse_routes(self.source.get(self.key))
+            except (FileNotFoundError, ValueError) as e:
+                if not self._routes:
+                    raise
+                logger.error("Keeping the previous routing table: %s", e)
+            self._version = self.source.version
+        return self._routes
+
+    def route(self, feature: str | None) -> Route:
+        routes = self.routes
+        if feature:
+            for name in (feature, feature.split("/", 1)[0], feature.split("_", 1)[0]):
+                route = routes.get(name)
+                if route is not None:
+                    return route
+        return routes["default"]
+
+    def select(self, feature: str | None) -> tuple[Route, str]:
+        route = self.route(feature)
+        if route.fallback and self._degraded_until.get(route.name, 0) > time.monotonic():
+            return route, route.fallback
+        return route, route.model
+
+    def observe_latency(self, route: Route, model: str, seconds: float, kind: str = FIRST_TOKEN) -> None:
+        if route.slo is None or model != route.model:
+            return
+        stats = self._latency.get((route.name, kind))
+        if stats is None:
+            stats = self._latency[(route.name, kind)] = LatencyStats(size=50)
+        stats.observe(seconds)
+        if kind != FIRST_TOKEN:
+            return
+        if stats.count >= self.min_samples and stats.percentile(0.9) > route.slo:
+            logger.warning(
+                "%s on route %s is over its %.1fs SLO (p90 %.1fs), using %s for %.0fs",
+                model, route.name, route.slo, stats.percentile(0.9), route.fallback, self.cooldown,
+            )
+            self._degraded_until[route.name] = time.monotonic() + self.cooldown
+            self._latency.pop((route.name, kind))
+            self.fallbacks += 1
+
+    def record_usage(self, feature: str | None, model: str, usage) -> None:
+        if usage is None:
+            return
+        feature = feature or "default"
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (details.cached_tokens if details is not None else None) or 0
+        counters = self.usage.setdefault(
+            feature, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        )
+        counters["requests"] += 1
+        counters["prompt_tokens"] += usage.prompt_tokens
+        counters["cached_tokens"] += cached
+        counters["completion_tokens"] += usage.completion_tokens
+        TOKENS.inc(usage.prompt_tokens, feature, model, "prompt")
+        TOKENS.inc(cached, feature, model, "cached")
+        TOKENS.inc(usage.completion_tokens, feature, model, "completion")
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "fallbacks": self.fallbacks,
+            "degraded_routes": sum(1 for until in self._degraded_until.values() if until > now),
+            "usage": self.usage,
+            # Share of prompt tokens served from upstream's prompt cache.
+            "cached_ratio": {
+                feature: round(counters["cached_tokens"] / counters["prompt_tokens"], 3)
+                for feature, counters in self.usage.items()
+                if counters["prompt_tokens"]
+            },
+        }
+
+
+model_router = ModelRouter()
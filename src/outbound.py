@@ -0,0 +1,144 @@
+import time
+import asyncio
+import logging
+import datetime
+from collections import OrderedDict
+from typing import Any, Callable, Coroutine
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import (
+    TELEGRAM_GLOBAL_PER_SEC,
+    TELEGRAM_CHAT_PER_MIN,
+    TELEGRAM_GROUP_PER_MIN,
+    TELEGRAM_MAX_RETRIES,
+)
+from metrics import TELEGRAM_SECONDS, LatencyStats, observe_stage
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+CHAT_BURST = 3
+MAX_TRACKED_CHATS = 10000
+# Endpoints that post into a chat count against that chat's limit.
+CHAT_ENDPOINT_PREFIXES = ("send", "copy", "forward", "edit")
+
+
+def _seconds(retry_after: int | datetime.timedelta) -> float:
+    if isinstance(retry_after, datetime.timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class OutboundRateLimiter(BaseRateLimiter[None]):
+    # Spaces out Bot API calls so the bot stays under Telegram's flood limits
+    # (about 30 messages per second overall, one per second in a private chat
+    # and 20 per minute in a group) instead of running into RetryAfter. When
+    # Telegram answers with RetryAfter anyway, the affected chat, or the whole
+    # bot for calls without a chat, is paused for that long and the call is
+    # repeated.
+
+    def __init__(
+        self,
+        global_per_sec: float = TELEGRAM_GLOBAL_PER_SEC,
+        chat_per_min: float = TELEGRAM_CHAT_PER_MIN,
+        group_per_min: float = TELEGRAM_GROUP_PER_MIN,
+        max_retries: int = TELEGRAM_MAX_RETRIES,
+    ):
+        self.global_bucket = TokenBucket(global_per_sec * 60, capacity=global_per_sec)
+        self.chat_per_min = chat_per_min
+        self.group_per_min = group_per_min
+        self.max_retries = max_retries
+        self.latency: dict[str, LatencyStats] = {}
+        self.throttled = 0
+        self.retried = 0
+        self._chats: OrderedDict[int | str, TokenBucket] = OrderedDict()
+        self._paused_until: dict[int | str | None, float] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self.latency:
+            logger.info("Telegram send stats: %s", self.stats())
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            group = isinstance(chat_id, str) or chat_id < 0
+            per_minute = self.group_per_min if group else self.chat_per_min
+            bucket = self._chats[chat_id] = TokenBucket(per_minute, capacity=CHAT_BURST)
+            if len(self._chats) > MAX_TRACKED_CHATS:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    async def _wait_turn(self, chat_id: int | str | None) -> None:
+        chat_bucket = self._chat_bucket(chat_id) if chat_id is not None else None
+        throttled = False
+        while True:
+            now = time.monotonic()
+            delay = max(
+                self._paused_until.get(None, 0) - now,
+                self._paused_until.get(chat_id, 0) - now,
+                self.global_bucket.delay(1),
+                chat_bucket.delay(1) if chat_bucket is not None else 0,
+            )
+            if delay <= 0:
+                break
+            throttled = True
+            await asyncio.sleep(delay)
+        self.throttled += throttled
+        self.global_bucket.take(1)
+        if chat_bucket is not None:
+            chat_bucket.take(1)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, bool | dict | list[dict]]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: None,
+    ) -> bool | dict | list[dict]:
+        chat_id = data.get("chat_id") if endpoint.startswith(CHAT_ENDPOINT_PREFIXES) else None
+        stats = self.latency.get(endpoint)
+        if stats is None:
+            stats = self.latency[endpoint] = LatencyStats()
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            await self._wait_turn(chat_id)
+            try:
+                result = await callback(*args, **kwargs)
+                break
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retried += 1
+                delay = _seconds(e.retry_after)
+                now = time.monotonic()
+                self._paused_until = {
+                    key: until for key, until in self._paused_until.items() if until > now
+                }
+                self._paused_until[chat_id] = max(self._paused_until.get(chat_id, 0), now + delay)
+                logger.warning("Telegram flood control on %s (chat %s), retrying in %.0fs", endpoint, chat_id, delay)
+        elapsed = time.perf_counter() - started
+        stats.observe(elapsed)
+        TELEGRAM_SECONDS.observe(elapsed, endpoint)
+        observe_stage("telegram_send", elapsed)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "throttled": self.throttled,
+            "retried": self.retried,
+            "endpoints": {
+                endpoint: {key: round(value, 4) for key, value in stats.summary().items()}
+                for endpoint, stats in self.latency.items()
+            },
+        }
@@ -0,0 +1,129 @@
+import io
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from config import PDF_WORKERS, PDF_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+FONT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "fonts",
+    "DejaVuSans.ttf"
+)
+
+_font_registered = False
+
+
+class RendererBusy(Exception):
+    pass
+
+
+# reportlab is imported inside the functions below: they run in the worker
+# processes, so unless PDF_WORKERS is 0 the bot process never loads it.
+def register_fonts() -> None:
+    global _font_registered
+    if not _font_registered:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        pdfmetrics.registerFont(TTFont("DejaVu", FONT_PATH))
+        _font_registered = True
+
+
+def render_resume_pdf(data: dict, resume_text: str) -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    register_fonts()
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - 50
+
+    c.setFont("DejaVu", 20)
+    c.drawString(
+        50,
+        y,
+        f"{data.get('name', '')} — {data.get('specialty', '')}"
+    )
+    y -= 40
+
+    if data.get("photo"):
+        try:
+            c.drawImage(
+                ImageReader(io.BytesIO(data["photo"])),
+                400,
+                height - 200,
+                width=150,
+                height=150,
+                preserveAspectRatio=True,
+                mask="auto"
+            )
+        except Exception as e:
+            logger.error(f"Помилка під час додавання фото: {e}")
+
+    c.setFont("DejaVu", 12)
+    for line in resume_text.split("\n"):
+        if y < 50:
+            c.showPage()
+            y = height - 50
+            c.setFont("DejaVu", 12)
+
+        c.drawString(50, y, line)
+        y -= 18
+
+    c.save()
+    return buffer.getvalue()
+
+
+class PdfRenderer:
+    # Renders PDFs in worker processes so reportlab never runs on the event
+    # loop. At most two jobs per worker are handed to the pool at a time, and
+    # once `max_pending` jobs are in flight new ones are refused with
+    # RendererBusy. With `workers=0` rendering happens inline.
+
+    def __init__(self, workers: int = PDF_WORKERS, max_pending: int = PDF_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._slots = asyncio.Semaphore(max(workers, 1) * 2)
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=register_fonts,
+            )
+        return self._executor
+
+    async def run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        if self.pending >= self.max_pending:
+            raise RendererBusy(f"{self.pending} PDF jobs are already waiting")
+        self.pending += 1
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+
+    async def render_resume(self, data: dict, resume_text: str) -> bytes:
+        return await self.run(render_resume_pdf, data, resume_text)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pdf_renderer = PdfRenderer()
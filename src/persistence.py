@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import logging
+import sqlite3
+import threading
+from typing import Any, Hashable, Iterable
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from config import (
+    STATE_BACKEND,
+    STATE_DB,
+    STATE_REDIS_URL,
+    STATE_TTL,
+    PERSISTENCE_INTERVAL,
+)
+from conversations import ConversationStore, conversation_store
+
+logger = logging.getLogger(__name__)
+
+USER = "user"
+CHAT = "chat"
+SESSION = "session"
+
+# (kind, key, JSON-encoded value or None to delete)
+Row = tuple[str, str, bytes | None]
+
+
+def _encode_key(key: Hashable) -> str:
+    return json.dumps(key, separators=(",", ":"))
+
+
+def _decode_key(key: str) -> Hashable:
+    value = json.loads(key)
+    return tuple(value) if isinstance(value, list) else value
+
+
+# Values are stored as JSON rather than pickle: the store may be reachable by
+# other services, and unpickling a row written there would run its code.
+# Bytes (a session's token counts) are the only non-JSON type in the state.
+
+def _encode_bytes(value: Any) -> dict:
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"{type(value).__name__} cannot be persisted")
+
+
+def _decode_bytes(value: dict) -> Any:
+    if value.keys() == {"__bytes__"}:
+        return base64.b64decode(value["__bytes__"])
+    return value
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_encode_bytes).encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    return json.loads(data, object_hook=_decode_bytes)
+
+
+class SQLiteStateStore:
+    # One row per user, chat or conversation. WAL mode lets several worker
+    # processes share the file; each batch is a single transaction.
+
+    def __init__(self, path: str = STATE_DB, ttl: float = STATE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "kind TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (kind, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS state_updated ON state (updated)")
+        self._db.commit()
+
+    def load(self) -> list[tuple[str, str, bytes]]:
+        with self._lock:
+            if self.ttl > 0:
+                self._db.execute("DELETE FROM state WHERE updated < ?", (time.time() - self.ttl,))
+                self._db.commit()
+            return self._db.execute("SELECT kind, key, value FROM state").fetchall()
+
+    def write(self, rows: Iterable[Row]) -> None:
+        now = time.time()
+        with self._lock, self._db:
+            for kind, key, value in rows:
+                if value is None:
+                    self._db.execute("DELETE FROM state WHERE kind = ? AND key = ?", (kind, key))
+                else:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO state (kind, key, value, updated) VALUES (?, ?, ?, ?)",
+                        (kind, key, value, now),
+                    )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class RedisStateStore:
+    # Same layout on a Redis-compatible server: one key per row, expiring
+    # after `ttl`, written in one pipeline per batch.
+
+    def __init__(self, url: str = STATE_REDIS_URL, ttl: float = STATE_TTL, prefix: str = "bot:state:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("STATE_BACKEND=redis needs the 'redis' package: pip install redis") from e
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def load(self) -> list[tuple[str, str, bytes]]:
+        rows = []
+        names = list(self._redis.scan_iter(match=self.prefix + "*", count=1000))
+        for start in range(0, len(names), 1000):
+            batch = names[start:start + 1000]
+            for name, value in zip(batch, self._redis.mget(batch)):
+                if value is None:
+                    continue
+                kind, _, key = name.decode("utf-8")[len(self.prefix):].partition(":")
+                rows.append((kind, key, value))
+        return rows
+
+    def write(self, rows: Iterable[Row]) -> None:
+        pipeline = self._redis.pipeline(transaction=False)
+        for kind, key, value in rows:
+            name = f"{self.prefix}{kind}:{key}"
+            if value is None:
+                pipeline.delete(name)
+            else:
+                pipeline.set(name, value, ex=int(self.ttl) if self.ttl > 0 else None)
+        pipeline.execute()
+
+    def close(self) -> None:
+        self._redis.close()
+
+
+class StatePersistence(BasePersistence):
+    # user_data, chat_data and the ChatGPT conversation store survive
+    # restarts. PTB hands over changed entries every `update_interval`
+    # seconds; they are buffered and written behind in one batch, and
+    # entries whose serialised form did not change are skipped.
+
+    def __init__(
+        self,
+        store,
+        update_interval: float = PERSISTENCE_INTERVAL,
+        conversations: ConversationStore = conversation_store,
+    ):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self.conversations = conversations
+        self.writes = 0
+        self.skipped = 0
+        self._loaded: dict[str, dict[Hashable, Any]] | None = None
+        self._load_lock = asyncio.Lock()
+        self._written: dict[tuple[str, str], int] = {}
+        self._pending: dict[tuple[str, str], bytes | None] = {}
+        self._writer: asyncio.Task | None = None
+
+    async def _load(self) -> dict[str, dict[Hashable, Any]]:
+        async with self._load_lock:
+            if self._loaded is None:
+                started = time.perf_counter()
+                rows = await asyncio.to_thread(self.store.load)
+                loaded: dict[str, dict[Hashable, Any]] = {}
+                for kind, key, value in rows:
+                    try:
+                        decoded = _loads(value)
+                    except ValueError:
+                        # Rows from older versions were pickled; they are
+                        # dropped and rewritten on the next change.
+                        logger.warning("Skipping unreadable persisted %s entry %s", kind, key)
+                        continue
+                    self._written[(kind, key)] = hash(value)
+                    loaded.setdefault(kind, {})[_decode_key(key)] = decoded
+                for session_id, state in loaded.pop(SESSION, {}).items():
+                    self.conversations.restore(session_id, state)
+                self._loaded = loaded
+                logger.info(
+                    "Loaded %s persisted entries in %.0f ms", len(rows), (time.perf_counter() - started) * 1000
+                )
+        return self._loaded
+
+    def _stage(self, kind: str, key: Hashable, value: Any) -> None:
+        encoded_key = _encode_key(key)
+        data = None if value is None else _dumps(value)
+        fingerprint = None if data is None else hash(data)
+        if self._written.get((kind, encoded_key)) == fingerprint:
+            self.skipped += 1
+            return
+        self._pending[(kind, encoded_key)] = data
+
+    def _queue(self, kind: str, key: Hashable, value: Any) -> None:
+        self._stage(kind, key, value)
+        if not (self._pending or self.conversations.dirty):
+            return
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_behind())
+
+    def _take_batch(self) -> list[Row]:
+        for session_id, state in self.conversations.drain().items():
+            self._stage(SESSION, session_id, state)
+        batch, self._pending = self._pending, {}
+        for (kind, key), value in batch.items():
+            if value is None:
+                self._written.pop((kind, key), None)
+            else:
+                self._written[(kind, key)] = hash(value)
+        return [(kind, key, value) for (kind, key), value in batch.items()]
+
+    async def _write_behind(self) -> None:
+        # Yield once so every update handed over in this persistence run
+        # ends up in the same batch.
+        await asyncio.sleep(0)
+        batch = self._take_batch()
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(self.store.write, batch)
+            self.writes += 1
+        except Exception as e:
+            logger.error(f"Persisting {len(batch)} state entries failed: {e}")
+            for kind, key, value in batch:
+                self._written.pop((kind, key), None)
+                self._pending.setdefault((kind, key), value)
+
+    async def get_user_data(self) -> dict[int, dict[Any, Any]]:
+        return (await self._load()).pop(USER, {})
+
+    async def get_chat_data(self) -> dict[int, dict[Any, Any]]:
+        return (await self._load()).pop(CHAT, {})
+
+    async def get_bot_data(self) -> dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return (await self._load()).pop(f"conversation/{name}", {})
+
+    async def update_conversation(self, name: str, key: tuple[int | str, ...], new_state: object | None) -> None:
+        self._queue(f"conversation/{name}", key, new_state)
+
+    async def update_user_data(self, user_id: int, data: dict[Any, Any]) -> None:
+        self._queue(USER, user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict[Any, Any]) -> None:
+        self._queue(CHAT, chat_id, data)
+
+    async def update_bot_data(self, data: dict[Any, Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._queue(USER, user_id, None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._queue(CHAT, chat_id, None)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict[Any, Any]) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._writer is not None:
+            await self._writer
+        batch = self._take_batch()
+        if batch:
+            await asyncio.to_thread(self.store.write, batch)
+            self.writes += 1
+        logger.info("State persistence: %s batches written, %s unchanged entries skipped", self.writes, self.skipped)
+        await asyncio.to_thread(self.store.close)
+
+
+def build_persistence(backend: str = STATE_BACKEND) -> StatePersistence | None:
+    if backend == "sqlite":
+        return StatePersistence(SQLiteStateStore())
+    if backend == "redis":
+        return StatePersistence(RedisStateStore())
+    return None
@@ -0,0 +1,59 @@
+import io
+from collections import OrderedDict
+
+from config import RESUME_PHOTO_DPI, PHOTO_CACHE_MAX_BYTES
+
+RESUME_PHOTO_SIZE_PT = 150
+
+
+def prepare_photo(data: bytes, size_pt: int = RESUME_PHOTO_SIZE_PT, dpi: int = RESUME_PHOTO_DPI) -> bytes:
+    # Decodes an uploaded photo once, fits it into the box it is drawn in on
+    # the PDF at the target DPI and re-encodes it as JPEG, which reportlab
+    # embeds as-is instead of decoding and recompressing the original.
+    # Pillow is only needed in the PDF worker processes that run this.
+    from PIL import Image, ImageOps
+
+    size_px = round(size_pt * dpi / 72)
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size_px, size_px), Image.LANCZOS)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=85, optimize=True)
+    return buffer.getvalue()
+
+
+class PhotoCache:
+    def __init__(self, max_bytes: int = PHOTO_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._photos: OrderedDict[str, bytes] = OrderedDict()
+
+    def get(self, file_unique_id: str) -> bytes | None:
+        photo = self._photos.get(file_unique_id)
+        if photo is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._photos.move_to_end(file_unique_id)
+        return photo
+
+    def put(self, file_unique_id: str, photo: bytes) -> None:
+        if file_unique_id in self._photos:
+            self.size -= len(self._photos.pop(file_unique_id))
+        self._photos[file_unique_id] = photo
+        self.size += len(photo)
+        while self.size > self.max_bytes and len(self._photos) > 1:
+            _, evicted = self._photos.popitem(last=False)
+            self.size -= len(evicted)
+
+
+photo_cache = PhotoCache()
@@ -0,0 +1,61 @@
+import json
+import hashlib
+from collections import OrderedDict
+from typing import NamedTuple
+
+from tokens import count_message_tokens
+
+
+class Prefix(NamedTuple):
+    message: dict
+    tokens: int
+    key: str
+
+
+class PrefixCache:
+    # System prompts come from a handful of catalogue files, so each text is
+    # counted and turned into its request message once and then shared by
+    # every request that starts with it. Reusing the same message keeps the
+    # start of the request byte-identical, which is what upstream prompt
+    # caching matches on; `key` (a digest of the serialised message) is sent
+    # as prompt_cache_key so requests with the same prefix land on the same
+    # cache. A reloaded prompt gets a new entry and the old one ages out.
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._prefixes: OrderedDict[str, Prefix] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+    def get(self, text: str) -> Prefix:
+        prefix = self._prefixes.get(text)
+        if prefix is not None:
+            self.hits += 1
+            self._prefixes.move_to_end(text)
+            return prefix
+        self.misses += 1
+        message = {"role": "system", "content": text}
+        serialised = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode()
+        prefix = Prefix(message, count_message_tokens(text), hashlib.sha256(serialised).hexdigest()[:32])
+        self._prefixes[text] = prefix
+        while len(self._prefixes) > self.max_size:
+            self._prefixes.popitem(last=False)
+        return prefix
+
+    def lookup(self, messages: list[dict]) -> Prefix | None:
+        # The prefix a request was built from: its leading system message,
+        # if that message came from this cache.
+        if messages and messages[0]["role"] == "system":
+            prefix = self._prefixes.get(messages[0]["content"])
+            if prefix is not None and prefix.message is messages[0]:
+                return prefix
+        return None
+
+    def stats(self) -> dict:
+        return {"prefixes": len(self._prefixes), "hits": self.hits, "misses": self.misses}
+
+
+prefix_cache = PrefixCache()
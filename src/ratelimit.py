@@ -0,0 +1,228 @@
+import re
+import heapq
+import random
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Mapping
+
+from config import (
+    OPENAI_MAX_CONCURRENCY,
+    OPENAI_REQUESTS_PER_MIN,
+    OPENAI_TOKENS_PER_MIN,
+    OPENAI_BACKOFF_BASE,
+    OPENAI_BACKOFF_MAX,
+)
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_PREFETCH = 2
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str | None) -> float | None:
+    # OpenAI reports resets as "1s", "6m0s" or "20ms".
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def backoff_delay(
+    attempt: int,
+    retry_after: float | None = None,
+    base: float = OPENAI_BACKOFF_BASE,
+    cap: float = OPENAI_BACKOFF_MAX,
+) -> float:
+    # Exponential backoff with jitter so clients that failed together do not
+    # retry together; an explicit Retry-After from upstream wins.
+    if retry_after is not None:
+        return min(retry_after, cap)
+    return random.uniform(0.5, 1.0) * min(cap, base * 2 ** attempt)
+
+
+class TokenBucket:
+    # Refills at `per_minute` and holds up to `capacity` (a full minute's
+    # worth by default); a zero rate disables the bucket.
+
+    def __init__(self, per_minute: float, capacity: float | None = None):
+        self.capacity = float(per_minute if capacity is None else capacity)
+        self.rate = per_minute / 60
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        if self.capacity <= 0 or self.rate <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(amount - self.level, 0) / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.capacity > 0:
+            self._refill()
+            self.level -= amount
+
+    def resize(self, per_minute: float) -> None:
+        if per_minute != self.capacity:
+            self._refill()
+            self.capacity = float(per_minute)
+            self.rate = per_minute / 60
+            self.level = min(self.level, self.capacity)
+
+    def clamp(self, remaining: float) -> None:
+        # Upstream is the source of truth: other processes share the quota.
+        self._refill()
+        self.level = min(self.level, remaining)
+
+
+class Permit:
+    __slots__ = ("limiter", "estimate")
+
+    def __init__(self, limiter: "RateLimiter", estimate: int):
+        self.limiter = limiter
+        self.estimate = estimate
+
+    def settle(self, used_tokens: int) -> None:
+        # Requests reserve prompt + max_tokens up front; once usage is known
+        # the unused part goes back into the bucket.
+        self.limiter.tokens.take(used_tokens - self.estimate)
+        self.estimate = used_tokens
+
+
+class RateLimiter:
+    # Admits OpenAI requests by priority: a request waits until it is the
+    # highest-priority waiter, a concurrency slot is free and both the
+    # request and token buckets can cover it. A 429 pauses everyone until
+    # the upstream reset instead of letting every caller fail on its own.
+
+    def __init__(
+        self,
+        requests_per_min: float = OPENAI_REQUESTS_PER_MIN,
+        tokens_per_min: float = OPENAI_TOKENS_PER_MIN,
+        max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+    ):
+        self.requests = TokenBucket(requests_per_min)
+        self.tokens = TokenBucket(tokens_per_min)
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self.admitted = 0
+        self.throttled = 0
+        self.retries = 0
+        self._paused_until = 0.0
+        self._waiters: list[list] = []
+        self._sequence = itertools.count()
+
+    def _delay(self, estimate: int) -> float | None:
+        if self.running >= self.max_concurrency:
+            return None
+        return max(
+            self._paused_until - time.monotonic(),
+            self.requests.delay(1),
+            self.tokens.delay(estimate),
+        )
+
+    def _wake_head(self) -> None:
+        if self._waiters:
+            self._waiters[0][2].set()
+
+    async def acquire(self, estimate: int, priority: int = PRIORITY_INTERACTIVE) -> Permit:
+        entry = [priority, next(self._sequence), asyncio.Event()]
+        heapq.heappush(self._waiters, entry)
+        waited = False
+        try:
+            while True:
+                delay = self._delay(estimate) if self._waiters[0] is entry else None
+                if delay is not None and delay <= 0:
+                    heapq.heappop(self._waiters)
+                    break
+                waited = True
+                entry[2].clear()
+                try:
+                    await asyncio.wait_for(entry[2].wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            self._wake_head()
+            raise
+        reserved = int(min(estimate, self.tokens.capacity)) if self.tokens.capacity > 0 else 0
+        self.requests.take(1)
+        self.tokens.take(reserved)
+        self.running += 1
+        self.admitted += 1
+        self.throttled += waited
+        self._wake_head()
+        return Permit(self, reserved)
+
+    def release(self) -> None:
+        self.running -= 1
+        self._wake_head()
+
+    @asynccontextmanager
+    async def slot(self, estimate: int, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[Permit]:
+        permit = await self.acquire(estimate, priority)
+        try:
+            yield permit
+        finally:
+            self.release()
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            try:
+                if limit is not None:
+                    bucket.resize(float(limit))
+                if remaining is not None:
+                    bucket.clamp(float(remaining))
+            except ValueError:
+                continue
+
+    def pause(self, headers: Mapping[str, str] | None) -> float | None:
+        # Called on a 429: hold every waiter until upstream says the window
+        # has reset. Returns the delay upstream asked for, if any.
+        headers = headers or {}
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after is None:
+            resets = [
+                parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                for kind in ("requests", "tokens")
+            ]
+            resets = [reset for reset in resets if reset is not None]
+            retry_after = max(resets) if resets else None
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        return retry_after
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "requests_available": round(self.requests.level, 1),
+            "tokens_available": round(self.tokens.level),
+        }
+
+
+request_limiter = RateLimiter()
@@ -0,0 +1,90 @@
+import os
+import logging
+import threading
+from types import MappingProxyType
+
+from config import RESOURCE_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+
+
+class ResourceCatalogue:
+    # Every text resource is read once into an immutable mapping keyed by its
+    # path without extension, e.g. "prompts/translator/en". Reloads build a new
+    # mapping and swap it in, so lookups never see a half-loaded catalogue.
+
+    def __init__(self, root: str = RESOURCES_DIR, sections: tuple = ('prompts', 'messages', 'intents', 'models')):
+        self.root = root
+        self.sections = sections
+        self._entries: MappingProxyType = MappingProxyType({})
+        self._mtimes: dict[str, int] = {}
+        # Bumped on every load so derived data can tell when to rebuild.
+        self.version = 0
+        self._watcher: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.load()
+
+    def _scan(self) -> dict[str, int]:
+        mtimes = {}
+        for section in self.sections:
+            for directory, _, files in os.walk(os.path.join(self.root, section)):
+                for file_name in files:
+                    if file_name.endswith('.txt'):
+                        path = os.path.join(directory, file_name)
+                        mtimes[path] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def load(self) -> None:
+        mtimes = self._scan()
+        entries = {}
+        for path in mtimes:
+            key = os.path.relpath(path, self.root)[:-len('.txt')].replace(os.sep, '/')
+            with open(path, "r", encoding="utf-8") as file:
+                entries[key] = file.read()
+        self._entries = MappingProxyType(entries)
+        self._mtimes = mtimes
+        self.version += 1
+
+    def get(self, key: str) -> str:
+        try:
+            return self._entries[key]
+        except KeyError:
+            raise FileNotFoundError(f"Resource '{key}' not found in {self.root}") from None
+
+    def keys(self, prefix: str = '') -> list[str]:
+        return [key for key in self._entries if key.startswith(prefix)]
+
+    def reload_if_changed(self) -> bool:
+        if self._scan() == self._mtimes:
+            return False
+        self.load()
+        logger.info("Resources reloaded from %s", self.root)
+        return True
+
+    def watch(self, interval: float = RESOURCE_RELOAD_INTERVAL) -> None:
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch,
+            args=(interval,),
+            name="resource-watcher",
+            daemon=True,
+        )
+        self._watcher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._watcher = None
+
+    def _watch(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.reload_if_changed()
+            except OSError as e:
+                logger.warning("Resource reload failed: %s", e)
+
+
+catalogue = ResourceCatalogue()
@@ -1,31 +1,22 @@
-import os
+import io
 import logging
 import collections
 
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
 from telegram import Update, InputFile
 from telegram.ext import ContextTypes
 
 from utils import send_image, send_text, load_prompt
 from gpt import ChatGPTService
-from config import CHATGPT_TOKEN
+from ratelimit import PRIORITY_BULK
+from router import router
+from pdf import RendererBusy, pdf_renderer
+from photos import photo_cache, prepare_photo
+from metrics import timed
+from config import CHATGPT_TOKEN, RESUME_PHOTO_MAX_BYTES, RESUME_PDF_MAX_BYTES
 
 logger = logging.getLogger(__name__)
 
-
-FONT_PATH = os.path.join(
-    os.path.dirname(os.path.abspath(__file__)),
-    "fonts",
-    "DejaVuSans.ttf"
-)
-
-pdfmetrics.registerFont(TTFont("DejaVu", FONT_PATH))
-
 chatgpt_service = ChatGPTService(CHATGPT_TOKEN)
 
 RESUME_FIELDS = [
@@ -62,6 +53,7 @@ async def resume(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=resume_control_keyboard()
     )
 
+@router.state("resume", media=True)
 async def message_handler_resume(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.user_data.get("conversation_state") != "resume":
         return False
@@ -72,11 +64,9 @@ async def message_handler_resume(update: Update, context: ContextTypes.DEFAULT_T
     if field_name == "photo":
         if update.message.photo:
             file = update.message.photo[-1]
-            file_obj = await file.get_file()
 
         elif update.message.document:
             file = update.message.document
-            file_obj = await file.get_file()
 
         else:
             await send_text(
@@ -86,11 +76,30 @@ async def message_handler_resume(update: Update, context: ContextTypes.DEFAULT_T
             )
             return True
 
-        os.makedirs("tmp", exist_ok=True)
-        photo_path = f"tmp/{update.effective_user.id}_photo.jpg"
-        await file_obj.download_to_drive(photo_path)
+        if file.file_size and file.file_size > RESUME_PHOTO_MAX_BYTES:
+            await send_text(
+                update,
+                context,
+                f"❗ Фото завелике. Максимальний розмір — {RESUME_PHOTO_MAX_BYTES // (1024 * 1024)} МБ."
+            )
+            return True
 
-        context.user_data["resume_data"]["photo"] = photo_path
+        try:
+            await load_resume_photo(context, file.file_id, file.file_unique_id)
+        except RendererBusy:
+            await send_text(update, context, "⏳ Зараз створюється забагато резюме. Спробуйте за хвилину.")
+            return True
+        except Exception as e:
+            logger.error(f"Помилка під час обробки фото: {e}")
+            await send_text(
+                update,
+                context,
+                "❗ Не вдалося прочитати зображення. Надішліть, будь ласка, інше фото."
+            )
+            return True
+
+        context.user_data["resume_data"]["photo_file_id"] = file.file_id
+        context.user_data["resume_data"]["photo_unique_id"] = file.file_unique_id
 
     else:
         context.user_data["resume_data"][field_name] = update.message.text
@@ -110,16 +119,30 @@ async def message_handler_resume(update: Update, context: ContextTypes.DEFAULT_T
     await send_text(update, context, "⏳ Зачекайте, створюю резюме...")
 
     try:
-        resume_text = await generate_resume_text(context.user_data["resume_data"])
-        pdf_path = create_resume_pdf(
-            context.user_data["resume_data"],
-            resume_text,
-            update.effective_user.id
-        )
-        with open(pdf_path, "rb") as pdf_file:
+        resume_data = dict(context.user_data["resume_data"])
+        resume_text = await generate_resume_text(resume_data)
+        if resume_data.get("photo_file_id"):
+            try:
+                resume_data["photo"] = await load_resume_photo(
+                    context,
+                    resume_data["photo_file_id"],
+                    resume_data["photo_unique_id"],
+                )
+            except RendererBusy:
+                raise
+            except Exception as e:
+                logger.error(f"Помилка під час додавання фото: {e}")
+        with timed("pdf_render"):
+            pdf_bytes = await pdf_renderer.render_resume(resume_data, resume_text)
+        if len(pdf_bytes) > RESUME_PDF_MAX_BYTES:
+            raise ValueError(f"Resume PDF is {len(pdf_bytes)} bytes, above the upload limit")
+        with timed("pdf_upload"):
             await update.message.reply_document(
-                InputFile(pdf_file, filename="resume.pdf")
+                InputFile(io.BytesIO(pdf_bytes), filename="resume.pdf")
             )
+    except RendererBusy:
+        logger.warning("PDF renderer is busy, resume request rejected")
+        await send_text(update, context, "⏳ Зараз створюється забагато резюме. Спробуйте за хвилину.")
     except Exception as e:
         logger.exception("Помилка при створенні резюме")
         await send_text(update, context, "❌ Помилка при створенні резюме.")
@@ -127,58 +150,33 @@ async def message_handler_resume(update: Update, context: ContextTypes.DEFAULT_T
         context.user_data.clear()
     return True
 
+async def load_resume_photo(
+    context: ContextTypes.DEFAULT_TYPE,
+    file_id: str,
+    file_unique_id: str,
+) -> bytes:
+    photo = photo_cache.get(file_unique_id)
+    if photo is None:
+        with timed("photo_download"):
+            file_obj = await context.bot.get_file(file_id)
+            original = bytes(await file_obj.download_as_bytearray())
+        with timed("photo_prepare"):
+            photo = await pdf_renderer.run(prepare_photo, original)
+        photo_cache.put(file_unique_id, photo)
+    return photo
+
 async def generate_resume_text(data: dict) -> str:
     prompt_template = load_prompt("resume")
     safe_data = collections.defaultdict(str, data)
     filled_prompt = prompt_template.format_map(safe_data)
-    chatgpt_service.set_prompt(filled_prompt)
-    return await chatgpt_service.add_message(
-        "Створи професійне резюме звичайним текстом, без Markdown, без ##, без списків та без символів форматування."
-    )
-
-def create_resume_pdf(data: dict, resume_text: str, user_id: int) -> str:
-    os.makedirs("tmp", exist_ok=True)
-    pdf_path = os.path.join("tmp", f"{user_id}_resume.pdf")
-
-    c = canvas.Canvas(pdf_path, pagesize=A4)
-    width, height = A4
-    y = height - 50
-
-    c.setFont("DejaVu", 20)
-    c.drawString(
-        50,
-        y,
-        f"{data.get('name', '')} — {data.get('specialty', '')}"
+    return await chatgpt_service.send_question(
+        filled_prompt,
+        "Створи професійне резюме звичайним текстом, без Markdown, без ##, без списків та без символів форматування.",
+        feature="resume",
+        priority=PRIORITY_BULK,
     )
-    y -= 40
-
-    if data.get("photo"):
-        try:
-            c.drawImage(
-                data["photo"],
-                400,
-                height - 200,
-                width=150,
-                height=150,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
-        except Exception as e:
-            logger.error(f"Помилка під час додавання фото: {e}")
-
-    c.setFont("DejaVu", 12)
-    for line in resume_text.split("\n"):
-        if y < 50:
-            c.showPage()
-            y = height - 50
-            c.setFont("DejaVu", 12)
-
-        c.drawString(50, y, line)
-        y -= 18
-
-    c.save()
-    return pdf_path
 
+@router.callback_prefix("resume_")
 async def resume_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
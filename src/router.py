@@ -0,0 +1,104 @@
+import logging
+from typing import Awaitable, Callable
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from metrics import instrument
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[object]]
+
+
+class Router:
+    # Feature modules register their handlers here at import time; bot.py
+    # installs a single CallbackQueryHandler and MessageHandler that dispatch
+    # with one dict lookup instead of testing a regex per handler.
+    #
+    # Callback data is matched exactly first, then by its prefix up to and
+    # including the first "_" ("talk_linus_torvalds" -> "talk_"). Messages go
+    # to the handler of the user's conversation_state, or the fallback.
+    # Every route carries the feature name its timings are recorded under.
+
+    def __init__(self):
+        self.states: dict[str, tuple[Handler, str]] = {}
+        self.media_states: set[str] = set()
+        self.callbacks: dict[str, tuple[Handler, str]] = {}
+        self.prefixes: dict[str, tuple[Handler, str]] = {}
+        self.fallback_route: tuple[Handler, str] | None = None
+
+    @staticmethod
+    def _add(table: dict, key: str, route: tuple[Handler, str]) -> None:
+        if key in table:
+            raise ValueError(f"Route {key!r} is already registered to {table[key][0].__qualname__}")
+        table[key] = route
+
+    def state(self, name: str, media: bool = False) -> Callable[[Handler], Handler]:
+        # `media` handlers also receive photos and documents without text.
+        def register(handler: Handler) -> Handler:
+            self._add(self.states, name, (handler, name))
+            if media:
+                self.media_states.add(name)
+            return handler
+        return register
+
+    def callback(self, *data: str, feature: str | None = None) -> Callable[[Handler], Handler]:
+        def register(handler: Handler) -> Handler:
+            for value in data:
+                self._add(self.callbacks, value, (handler, feature or value))
+            return handler
+        return register
+
+    def callback_prefix(self, prefix: str) -> Callable[[Handler], Handler]:
+        if not prefix.endswith("_") or prefix.count("_") != 1:
+            raise ValueError(f"Callback prefix {prefix!r} must end with its only '_'")
+
+        def register(handler: Handler) -> Handler:
+            self._add(self.prefixes, prefix, (handler, prefix[:-1]))
+            return handler
+        return register
+
+    def fallback(self, feature: str) -> Callable[[Handler], Handler]:
+        def register(handler: Handler) -> Handler:
+            self.fallback_route = (handler, feature)
+            return handler
+        return register
+
+    def resolve_callback(self, data: str) -> tuple[Handler, str] | None:
+        route = self.callbacks.get(data)
+        if route is None:
+            head, separator, _ = data.partition("_")
+            if separator:
+                route = self.prefixes.get(head + separator)
+        return route
+
+    def resolve_message(self, state: str | None, has_text: bool) -> tuple[Handler, str] | None:
+        route = self.states.get(state) if state is not None else None
+        if route is None:
+            return self.fallback_route if has_text else None
+        if not has_text and state not in self.media_states:
+            return None
+        return route
+
+    async def dispatch_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        data = update.callback_query.data or ""
+        route = self.resolve_callback(data)
+        if route is None:
+            logger.warning("No handler for callback data %r", data)
+            await update.callback_query.answer()
+            return
+        handler, feature = route
+        await instrument(feature, handler, update, context)
+
+    async def dispatch_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not update.message:
+            return
+        state = context.user_data.get("conversation_state")
+        route = self.resolve_message(state, bool(update.message.text))
+        if route is not None:
+            handler, feature = route
+            await instrument(feature, handler, update, context)
+
+
+router = Router()
@@ -0,0 +1,115 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Hashable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from config import UPDATE_CONCURRENCY, UPDATE_MAX_PENDING
+from metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+
+class _ChatQueue:
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+class ChatSerialUpdateProcessor(BaseUpdateProcessor):
+    # Runs updates of different chats in parallel, at most `max_concurrent_chats`
+    # at a time, while updates of one chat run strictly one after another in
+    # arrival order. PTB's own semaphore is sized to the number of pending
+    # updates so that an update waiting for its chat does not hold one of
+    # the processing slots.
+
+    def __init__(
+        self,
+        max_concurrent_chats: int = UPDATE_CONCURRENCY,
+        max_pending_updates: int = UPDATE_MAX_PENDING,
+    ):
+        super().__init__(max_concurrent_updates=max(max_pending_updates, 2))
+        self.max_concurrent_chats = max_concurrent_chats
+        self._slots = asyncio.Semaphore(max_concurrent_chats)
+        self._chats: dict[Hashable, _ChatQueue] = {}
+        self.queued = 0
+        self.running = 0
+        self.processed = 0
+        self.max_chat_depth = 0
+        self.wait_time = LatencyStats()
+        self.run_time = LatencyStats()
+
+    @staticmethod
+    def chat_key(update: object) -> Hashable | None:
+        if isinstance(update, Update):
+            if update.effective_chat:
+                return update.effective_chat.id
+            if update.effective_user:
+                return ("user", update.effective_user.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.chat_key(update)
+        queued_at = time.monotonic()
+        self.queued += 1
+        chat = None
+        if key is not None:
+            chat = self._chats.get(key)
+            if chat is None:
+                chat = self._chats[key] = _ChatQueue()
+            chat.depth += 1
+            self.max_chat_depth = max(self.max_chat_depth, chat.depth)
+        started = False
+        try:
+            if chat is not None:
+                await chat.lock.acquire()
+            try:
+                async with self._slots:
+                    started = True
+                    await self._run(coroutine, queued_at)
+            finally:
+                if chat is not None:
+                    chat.lock.release()
+        finally:
+            if not started:
+                self.queued -= 1
+                coroutine.close()
+            if chat is not None:
+                chat.depth -= 1
+                if chat.depth == 0:
+                    del self._chats[key]
+
+    async def _run(self, coroutine: Awaitable[Any], queued_at: float) -> None:
+        started = time.monotonic()
+        self.queued -= 1
+        self.wait_time.observe(started - queued_at)
+        self.running += 1
+        try:
+            await coroutine
+        finally:
+            self.running -= 1
+            self.processed += 1
+            self.run_time.observe(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "processed": self.processed,
+            "active_chats": len(self._chats),
+            "max_chat_depth": self.max_chat_depth,
+            # Flat keys, since /metrics only exports top-level numbers.
+            **{f"wait_time_{key}": value for key, value in self.wait_time.summary().items()},
+            **{f"run_time_{key}": value for key, value in self.run_time.summary().items()},
+        }
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self.processed:
+            logger.info("Update scheduler stats: %s", self.stats())
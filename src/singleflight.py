@@ -0,0 +1,108 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    __slots__ = ("task", "waiters", "parts", "done", "changed")
+
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        self.waiters = 0
+        self.parts: list[str] = []
+        self.done = False
+        self.changed = asyncio.Event()
+
+
+class SingleFlight:
+    # Identical requests issued while one is already in flight wait for that
+    # request instead of starting their own. The upstream call runs in its own
+    # task, so a waiter that goes away does not cancel it for the others; it is
+    # cancelled only when the last waiter is gone.
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._streams: dict[Hashable, _Broadcast] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.create_task(factory()))
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+                self._forget(self._calls, key, call)
+
+    async def stream(
+        self,
+        key: Hashable,
+        factory: Callable[[], AsyncIterator[str]],
+    ) -> AsyncIterator[str]:
+        # Every waiter replays the deltas received so far and then follows the
+        # live stream.
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = self._streams[key] = _Broadcast()
+            broadcast.task = asyncio.create_task(self._pump(broadcast, factory))
+            broadcast.task.add_done_callback(lambda _: self._forget(self._streams, key, broadcast))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        broadcast.waiters += 1
+        position = 0
+        try:
+            while True:
+                while position < len(broadcast.parts):
+                    position += 1
+                    yield broadcast.parts[position - 1]
+                if broadcast.done:
+                    broadcast.task.result()
+                    return
+                broadcast.changed.clear()
+                await broadcast.changed.wait()
+        finally:
+            broadcast.waiters -= 1
+            if broadcast.waiters == 0 and not broadcast.task.done():
+                broadcast.task.cancel()
+                self._forget(self._streams, key, broadcast)
+
+    @staticmethod
+    async def _pump(broadcast: _Broadcast, factory: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async for delta in factory():
+                broadcast.parts.append(delta)
+                broadcast.changed.set()
+        finally:
+            broadcast.done = True
+            broadcast.changed.set()
+
+    @staticmethod
+    def _forget(calls: dict, key: Hashable, call) -> None:
+        if calls.get(key) is call:
+            del calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
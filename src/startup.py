@@ -0,0 +1,42 @@
+import io
+import time
+import pstats
+import cProfile
+import logging
+
+from config import STARTUP_PROFILE
+
+logger = logging.getLogger(__name__)
+
+# bot.py imports this module first, so this is as close to process start as
+# the application can measure.
+started = time.perf_counter()
+
+_profiler: cProfile.Profile | None = None
+if STARTUP_PROFILE:
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+_marks: dict[str, float] = {}
+
+
+def mark(name: str) -> float:
+    if name not in _marks:
+        _marks[name] = time.perf_counter() - started
+        logger.info("Startup: %s after %.3fs", name, _marks[name])
+    return _marks[name]
+
+
+async def first_update(update, context) -> None:
+    # Registered in a late handler group when STARTUP_PROFILE is set, so it
+    # runs once the first update has gone through its handler.
+    global _profiler
+    if _profiler is None:
+        return
+    _profiler.disable()
+    mark("first update handled")
+    _profiler.dump_stats(STARTUP_PROFILE)
+    report = io.StringIO()
+    pstats.Stats(_profiler, stream=report).sort_stats("cumulative").print_stats(25)
+    logger.info("Startup profile written to %s\n%s", STARTUP_PROFILE, report.getvalue())
+    _profiler = None
@@ -2,9 +2,10 @@ import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from utils import send_image, send_text, load_prompt, send_text_buttons
+from utils import send_image, send_text, load_prompt, send_text_buttons, send_streamed_text, session_key
 
 from gpt import ChatGPTService
+from router import router
 from config import CHATGPT_TOKEN
 
 logger = logging.getLogger(__name__)
@@ -23,20 +24,17 @@ async def talk(update: Update, context: ContextTypes.DEFAULT_TYPE):
     }
     await send_text_buttons(update, context, "Оберіть особистість для спілкування ...", personalities)
 
+@router.callback_prefix("talk_")
 async def talk_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     data = query.data
-    if data == "start":
-        context.user_data.clear()
-        await send_text(update, context, "/start")
-        return
     if data.startswith("talk_"):
         context.user_data.clear()
         context.user_data["selected_personality"] = data
         context.user_data["conversation_state"] = "talk"
         prompt = load_prompt(data)
-        chatgpt_service.set_prompt(prompt)
+        chatgpt_service.set_prompt(session_key(update), prompt)
         personality_name = data.replace("talk_", "").replace("_", " ").title()
         await send_image(update, context, data)
         buttons = {'start': "Закінчити"}
@@ -47,4 +45,20 @@ async def talk_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"\nI heard you wanted to ask me something. "
             f"\nYou can ask questions in your native language.",
             buttons
-        )
\ No newline at end of file
+        )
+
+@router.state("talk")
+async def talk_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    personality = context.user_data.get("selected_personality")
+    if not personality:
+        await send_text(update, context, "Спочатку оберіть особистість для розмови!")
+        return
+
+    prompt = load_prompt(personality)
+    chatgpt_service.ensure_prompt(session_key(update), prompt)
+
+    await send_streamed_text(
+        update,
+        context,
+        chatgpt_service.stream_message(session_key(update), update.message.text, feature=personality),
+    )
@@ -0,0 +1,19 @@
+import re
+
+MESSAGE_OVERHEAD = 4
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    # Cheap approximation of the cl100k tokenizer: ASCII words average about
+    # four characters per token, Cyrillic and other scripts about two.
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        per_token = 4 if piece.isascii() else 2
+        tokens += -(-len(piece) // per_token)
+    return tokens
+
+
+def count_message_tokens(text: str) -> int:
+    return count_tokens(text) + MESSAGE_OVERHEAD
@@ -1,4 +1,8 @@
+import re
+import zlib
+import asyncio
 import logging
+from typing import AsyncIterator
 
 from telegram import Update
 from telegram.ext import ContextTypes
@@ -6,18 +10,26 @@ from telegram.ext import ContextTypes
 from utils import (
     send_text,
     send_text_buttons,
+    send_streamed_text,
+    build_keyboard,
     load_translator_prompt,
     send_image
 )
 
 from gpt import ChatGPTService
-from config import CHATGPT_TOKEN
+from ratelimit import PRIORITY_BULK
+from router import router
+from config import CHATGPT_TOKEN, TRANSLATION_SEGMENT_CHARS, TRANSLATION_PARALLELISM
 
 logger = logging.getLogger(__name__)
 
 chatgpt_service = ChatGPTService(CHATGPT_TOKEN)
 
-async def translator(update: Update, context: ContextTypes.DEFAULT_TYPE, start_func=None):
+PARAGRAPH_BREAK = re.compile(r"(\n\s*\n)")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?…])(\s+)")
+WORD_BREAK = re.compile(r"(\s+)")
+
+async def translator(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
     context.user_data["conversation_state"] = "translator"
 
@@ -37,18 +49,11 @@ async def translator(update: Update, context: ContextTypes.DEFAULT_TYPE, start_f
         buttons,
     )
 
-async def translator_button(update: Update, context: ContextTypes.DEFAULT_TYPE, start_func=None):
+@router.callback("translate_en", "translate_uk", "translate_de", "translator", feature="translator")
+async def translator_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    if query.data == "start":
-        context.user_data.clear()
-        if start_func:
-            await start_func(update, context)
-        else:
-            await update.message.reply_text("Помилка: функція start не знайдена")
-        return
-
     if query.data == "translator":
         context.user_data.clear()
         await translator(update, context)
@@ -72,6 +77,7 @@ async def translator_button(update: Update, context: ContextTypes.DEFAULT_TYPE,
         f"✏️ Надішліть текст для перекладу на {lang_name}:",
     )
 
+@router.state("translator")
 async def handle_translation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     lang_code = context.user_data.get("lang_code")
     lang_name = context.user_data.get("lang_name")
@@ -85,42 +91,102 @@ async def handle_translation(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await send_text(update, context, "Будь ласка, надішліть текст для перекладу.")
         return
 
-    waiting_message = await send_text(update, context, "⏳ Перекладаю...")
-
     try:
         prompt = load_translator_prompt(lang_code)
-        chatgpt_service.set_prompt(prompt)
-
-        translated_text = await chatgpt_service.add_message(message_text)
 
         buttons = {
             "translator": "🔁 Змінити мову",
             "start": "Закінчити"
         }
 
-        await send_text_buttons(
+        await send_streamed_text(
             update,
             context,
-            f"🌍 Переклад ({lang_name}):\n\n{translated_text}",
-            buttons
+            translate_text(prompt, message_text, f"translator/{lang_code}"),
+            placeholder="⏳ Перекладаю...",
+            prefix=f"🌍 Переклад ({lang_name}):\n\n",
+            parse_mode=None,
+            reply_markup=build_keyboard(buttons),
         )
 
     except Exception as e:
         logger.error(f"Translator error: {e}")
         await send_text(update, context, "❌ Помилка при перекладі.")
 
+    return
+
+
+def _split_units(text: str, pattern: re.Pattern, max_chars: int, separator: str) -> list[list[str]]:
+    parts = pattern.split(text)
+    units = []
+    for index in range(0, len(parts), 2):
+        piece = parts[index]
+        piece_separator = parts[index + 1] if index + 1 < len(parts) else separator
+        if not piece.strip():
+            if units:
+                units[-1][1] += piece + piece_separator
+            continue
+        if len(piece) > max_chars and pattern is not WORD_BREAK:
+            finer = SENTENCE_BREAK if pattern is PARAGRAPH_BREAK else WORD_BREAK
+            units.extend(_split_units(piece, finer, max_chars, piece_separator))
+        else:
+            units.append([piece, piece_separator])
+    return units
+
+
+def split_segments(text: str, max_chars: int = TRANSLATION_SEGMENT_CHARS) -> list[tuple[str, str]]:
+    # Splits text into (segment, separator) pairs at paragraph, then sentence,
+    # then word boundaries. A new segment starts when the current one would
+    # exceed `max_chars` or when a paragraph/sentence's checksum says so, so
+    # boundaries depend on content rather than position: editing one part of
+    # a long text leaves the other segments, and their cache entries, intact.
+    segments = []
+    current = ""
+    current_separator = ""
+    for unit, separator in _split_units(text, PARAGRAPH_BREAK, max_chars, ""):
+        if current and (
+            len(current) + len(current_separator) + len(unit) > max_chars
+            or zlib.crc32(unit.encode("utf-8")) % 4 == 0
+        ):
+            segments.append((current, current_separator))
+            current = ""
+        current = current + current_separator + unit if current else unit
+        current_separator = separator
+    if current:
+        segments.append((current, current_separator))
+    return segments
+
+
+async def translate_text(
+    prompt: str,
+    text: str,
+    feature: str,
+    max_chars: int = TRANSLATION_SEGMENT_CHARS,
+    parallelism: int = TRANSLATION_PARALLELISM,
+) -> AsyncIterator[str]:
+    if len(text) <= max_chars:
+        async for delta in chatgpt_service.stream_question(prompt, text, feature=feature):
+            yield delta
+        return
+
+    # Long texts are translated segment by segment with bounded parallelism
+    # and yielded in order as soon as every earlier segment is done. Each
+    # segment goes through the completion cache on its own.
+    slots = asyncio.Semaphore(parallelism)
+
+    async def translate_segment(segment: str) -> str:
+        async with slots:
+            return await chatgpt_service.send_question(prompt, segment, feature=feature, priority=PRIORITY_BULK)
+
+    segments = split_segments(text, max_chars)
+    tasks = [asyncio.create_task(translate_segment(segment)) for segment, _ in segments]
+    try:
+        for task, (_, separator) in zip(tasks, segments):
+            yield (await task).strip() + separator
     finally:
-        if 'waiting_message' in locals():
-            try:
-                await context.bot.delete_message(
-                    chat_id=update.effective_chat.id,
-                    message_id=waiting_message.message_id
-                )
-            except Exception as e:
-                logger.error(f"Error deleting waiting message: {e}")
-        await context.bot.delete_message(
-            chat_id=update.effective_chat.id,
-            message_id=waiting_message.message_id
-        )
+        for task in tasks:
+            task.cancel()
+        # Collect the outcomes so failed or cancelled segments are not
+        # reported as "Task exception was never retrieved".
+        await asyncio.gather(*tasks, return_exceptions=True)
 
-    return
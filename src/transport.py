@@ -0,0 +1,127 @@
+import logging
+import threading
+import importlib.util
+from typing import TYPE_CHECKING
+
+import httpx
+
+from config import (
+    OPENAI_BASE_URL,
+    OPENAI_PROXY,
+    OPENAI_TIMEOUT,
+    OPENAI_HTTP2,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE,
+    OPENAI_KEEPALIVE_EXPIRY,
+)
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionStats:
+    # Fed by httpcore's trace hook: every request reports when it sends its
+    # headers, and only requests that had to open a connection report a TCP
+    # connect (and a TLS handshake for https), so the difference is reuse.
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    async def trace(self, event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.connections += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+        elif event_name.endswith(".send_request_headers.started"):
+            self.requests += 1
+
+    async def on_request(self, request: httpx.Request) -> None:
+        request.extensions["trace"] = self.trace
+
+    def summary(self) -> dict:
+        reused = max(self.requests - self.connections, 0)
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reuse_ratio": reused / self.requests if self.requests else 0.0,
+        }
+
+
+connection_stats = ConnectionStats()
+
+_http_client: httpx.AsyncClient | None = None
+_openai_clients: dict[str, "AsyncOpenAI"] = {}
+_clients_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    if OPENAI_HTTP2 and importlib.util.find_spec("h2") is None:
+        logger.warning("OPENAI_HTTP2 is set but the 'h2' package is not installed, using HTTP/1.1")
+        return False
+    return OPENAI_HTTP2
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    with _clients_lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = _build_http_client()
+        return _http_client
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        proxy=OPENAI_PROXY,
+        timeout=OPENAI_TIMEOUT,
+        http2=_http2_enabled(),
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        event_hooks={"request": [connection_stats.on_request]},
+    )
+
+
+def get_openai_client(token: str) -> "AsyncOpenAI":
+    # One client per API key, all sharing the same connection pool. Retries
+    # are handled by gpt.py under the rate limiter, not by the SDK. The
+    # openai package takes about half a second to import, so it is only
+    # loaded here, on first use or by preload().
+    http_client = get_http_client()
+    client = _openai_clients.get(token)
+    if client is None or client._client is not http_client:
+        from openai import AsyncOpenAI
+
+        with _clients_lock:
+            client = _openai_clients.get(token)
+            if client is None or client._client is not http_client:
+                client = _openai_clients[token] = AsyncOpenAI(
+                    http_client=http_client,
+                    api_key=token,
+                    base_url=OPENAI_BASE_URL,
+                    timeout=OPENAI_TIMEOUT,
+                    max_retries=0,
+                )
+    return client
+
+
+def preload(token: str) -> None:
+    # Meant for a worker thread right after startup: imports openai and
+    # builds the client (including its SSL context) off the event loop.
+    get_openai_client(token)
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        if connection_stats.requests:
+            logger.info("OpenAI connection stats: %s", connection_stats.summary())
+        await _http_client.aclose()
+        _http_client = None
+    _openai_clients.clear()
@@ -1,10 +1,14 @@
-import os
+import time
+import asyncio
 import logging
+from typing import AsyncIterator
 
 from telegram.ext import ContextTypes
-from telegram.constants import ParseMode
+from telegram.constants import MessageLimit, ParseMode
+from telegram.error import BadRequest, TelegramError
 from telegram import (
     Update,
+    Message,
     BotCommand,
     BotCommandScopeChat,
     MenuButtonCommands,
@@ -12,14 +16,20 @@ from telegram import (
     InlineKeyboardMarkup
 )
 
+from config import STREAM_EDIT_INTERVAL, PLACEHOLDER_DELAY
+from images import EXTENSIONS, image_registry
+from resources import catalogue
+from metrics import timed
+
 logger = logging.getLogger(__name__)
 
 
+def session_key(update: Update) -> tuple[int, int]:
+    return update.effective_chat.id, update.effective_user.id
+
+
 def load_message(name: str) -> str:
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    message_path = os.path.join(current_dir, 'resources', 'messages', f'{name}.txt')
-    with open(message_path, "r", encoding="utf-8") as file:
-        return file.read()
+    return catalogue.get(f"messages/{name}")
 
 
 async def send_text(
@@ -39,30 +49,40 @@ async def send_text(
 
 
 async def send_image(update: Update, context: ContextTypes.DEFAULT_TYPE, name: str):
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    images_dir = os.path.join(current_dir, 'resources', 'images')
+    image_path = image_registry.path(name)
 
-    extensions = ('.jpg', '.jpeg', '.png', '.webp')
+    if image_path is None:
+        logger.warning(
+            "Image '%s' not found in %s. Supported extensions: %s",
+            name, image_registry.images_dir, EXTENSIONS
+        )
 
-    for ext in extensions:
-        image_path = os.path.join(images_dir, f'{name}{ext}')
-        if os.path.exists(image_path):
-            with open(image_path, 'rb') as image:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="⚠️ Картинка тимчасово недоступна"
+        )
+        return None
+
+    file_id = image_registry.file_id(context.bot.id, name)
+    if file_id:
+        try:
+            with timed("image_send"):
                 return await context.bot.send_photo(
                     chat_id=update.effective_chat.id,
-                    photo=image
+                    photo=file_id
                 )
+        except BadRequest as e:
+            logger.warning("Cached file_id for image '%s' was rejected: %s", name, e)
+            image_registry.forget(context.bot.id, name)
 
-
-    logger.warning(
-        "Image '%s' not found in %s. Supported extensions: %s",
-        name, images_dir, extensions
-    )
-
-    await context.bot.send_message(
-        chat_id=update.effective_chat.id,
-        text="⚠️ Картинка тимчасово недоступна"
-    )
+    with timed("image_upload"), open(image_path, 'rb') as image:
+        message = await context.bot.send_photo(
+            chat_id=update.effective_chat.id,
+            photo=image
+        )
+    if message.photo:
+        image_registry.remember(context.bot.id, name, message.photo[-1].file_id)
+    return message
 
 
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, commands: dict):
@@ -80,34 +100,185 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, com
     )
 
 def load_prompt(name: str):
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    prompt_path = os.path.join(current_dir, 'resources', 'prompts', f'{name}.txt')
-    with open(prompt_path, "r", encoding="utf-8") as file:
-        return file.read()
+    return catalogue.get(f"prompts/{name}")
 
 def load_translator_prompt(language_code: str) -> str:
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    prompt_path = os.path.join(
-        current_dir,
-        'resources',
-        'prompts',
-        'translator',
-        f'{language_code}.txt'
-    )
-    with open(prompt_path, "r", encoding="utf-8") as file:
-        return file.read()
+    return catalogue.get(f"prompts/translator/{language_code}")
 
 
-async def send_text_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, buttons: dict):
-    text = text.encode('utf8', errors='surrogatepass').decode('utf8')
+def build_keyboard(buttons: dict) -> InlineKeyboardMarkup:
     keyboard = []
     for key, value in buttons.items():
         button = InlineKeyboardButton(str(value), callback_data=str(key))
         keyboard.append([button])
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    return InlineKeyboardMarkup(keyboard)
+
+
+async def send_text_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, buttons: dict):
+    text = text.encode('utf8', errors='surrogatepass').decode('utf8')
+    reply_markup = build_keyboard(buttons)
     return await context.bot.send_message(
         chat_id=update.effective_message.chat_id,
         text=text,
         reply_markup=reply_markup,
         message_thread_id=update.effective_message.message_thread_id
-    )
\ No newline at end of file
+    )
+
+
+def _split_point(text: str, limit: int) -> int:
+    if len(text) <= limit:
+        return len(text)
+    for separator in ("\n\n", "\n", " "):
+        index = text.rfind(separator, 0, limit)
+        if index > limit // 2:
+            return index + len(separator)
+    return limit
+
+
+class DeferredPlaceholder:
+    # A "please wait" message that is only sent if the answer is not ready
+    # after `delay` seconds. Fast answers skip both the placeholder and its
+    # deletion, saving two Bot API calls.
+
+    def __init__(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int, text: str, delay: float = PLACEHOLDER_DELAY):
+        self.context = context
+        self.chat_id = chat_id
+        self.text = text
+        self.delay = delay
+        self.message: Message | None = None
+        self._sending = False
+        self._timer: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._timer = asyncio.create_task(self._show())
+
+    async def _show(self) -> None:
+        await asyncio.sleep(self.delay)
+        self._sending = True
+        self.message = await self.context.bot.send_message(chat_id=self.chat_id, text=self.text)
+
+    async def claim(self) -> Message | None:
+        # Stops the timer and returns the placeholder if it is already shown,
+        # so the caller can edit it into the answer.
+        timer, self._timer = self._timer, None
+        if timer is not None:
+            if not self._sending:
+                timer.cancel()
+            await asyncio.wait({timer})
+            if not timer.cancelled() and timer.exception() is not None:
+                logger.warning("Could not send placeholder: %s", timer.exception())
+        return self.message
+
+    async def discard(self) -> None:
+        message = await self.claim()
+        self.message = None
+        if message is not None:
+            try:
+                await message.delete()
+            except TelegramError as e:
+                logger.warning("Could not delete placeholder: %s", e)
+
+    async def __aenter__(self) -> "DeferredPlaceholder":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.discard()
+
+
+async def _send_message(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    text: str,
+    parse_mode: str | None = None,
+    reply_markup: InlineKeyboardMarkup | None = None,
+) -> Message:
+    try:
+        return await context.bot.send_message(
+            chat_id=chat_id, text=text, parse_mode=parse_mode, reply_markup=reply_markup
+        )
+    except BadRequest:
+        if parse_mode is None:
+            raise
+        return await _send_message(context, chat_id, text, reply_markup=reply_markup)
+
+
+async def _edit_text(
+    message: Message,
+    text: str,
+    parse_mode: str | None = None,
+    reply_markup: InlineKeyboardMarkup | None = None,
+) -> None:
+    try:
+        await message.edit_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+    except BadRequest as e:
+        if "not modified" in str(e).lower():
+            return
+        if parse_mode is None:
+            raise
+        # Markdown produced by the model is not always valid for Telegram.
+        await _edit_text(message, text, reply_markup=reply_markup)
+
+
+async def send_streamed_text(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    deltas: AsyncIterator[str],
+    placeholder: str = "...",
+    prefix: str = "",
+    parse_mode: str | None = ParseMode.MARKDOWN,
+    reply_markup: InlineKeyboardMarkup | None = None,
+    interval: float = STREAM_EDIT_INTERVAL,
+) -> str:
+    # Shows deltas as they arrive. Nothing is sent until `interval` seconds
+    # have passed, so a quick answer goes out as one formatted message; a slow
+    # one gets a deferred `placeholder` that is then edited, at most once per
+    # `interval` seconds to stay clear of Telegram flood limits. Intermediate
+    # edits are sent as plain text and only the final one uses `parse_mode`.
+    # Text beyond the 4096 character limit continues in a new message. If the
+    # stream fails before any text is shown the placeholder is removed.
+    # Returns the full streamed text without the prefix.
+    limit = MessageLimit.MAX_TEXT_LENGTH
+    chat_id = update.effective_chat.id
+    waiting = DeferredPlaceholder(context, chat_id, placeholder)
+    message = None
+    parts = []
+    pending = prefix
+    shown = None
+    last_edit = time.monotonic()
+
+    async def show(text: str, mode: str | None = None, markup: InlineKeyboardMarkup | None = None) -> None:
+        nonlocal message
+        if message is None:
+            message = await waiting.claim()
+            if message is None:
+                message = await _send_message(context, chat_id, text, mode, markup)
+                return
+        await _edit_text(message, text, mode, markup)
+
+    waiting.start()
+    try:
+        async for delta in deltas:
+            parts.append(delta)
+            pending += delta
+            while len(pending) > limit:
+                split = _split_point(pending, limit)
+                await show(pending[:split].rstrip(), parse_mode)
+                pending = pending[split:]
+                # The continuation starts as a placeholder; the loop keeps
+                # splitting until the rest fits into one message.
+                message = await context.bot.send_message(chat_id=chat_id, text="...")
+                shown = "..."
+                last_edit = time.monotonic()
+            if pending and pending != shown and time.monotonic() - last_edit >= interval:
+                await show(pending)
+                shown = pending
+                last_edit = time.monotonic()
+    except BaseException:
+        if message is None:
+            await waiting.discard()
+        raise
+
+    if pending != shown or parse_mode or reply_markup:
+        await show(pending or "...", parse_mode, reply_markup)
+    return "".join(parts)
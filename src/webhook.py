@@ -0,0 +1,227 @@
+import json
+import queue
+import signal
+import asyncio
+import logging
+import multiprocessing
+
+from telegram import Bot, Update
+
+from config import (
+    BOT_TOKEN,
+    BOT_API_BASE_URL,
+    BOT_API_FILE_URL,
+    DROP_PENDING_UPDATES,
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_WORKERS,
+    WEBHOOK_QUEUE_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1024 * 1024
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+def update_chat_id(data: dict) -> int:
+    # Every update type carries its chat either directly (message.chat,
+    # my_chat_member.chat), one level down (callback_query.message.chat) or
+    # only as a user (inline_query.from); updates without any go to shard 0.
+    for key, value in data.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        for candidate in (value, value.get("message")):
+            if isinstance(candidate, dict) and isinstance(candidate.get("chat"), dict):
+                return candidate["chat"]["id"]
+        sender = value.get("from") or value.get("user")
+        if isinstance(sender, dict):
+            return sender["id"]
+    return 0
+
+
+def shard_for(data: dict, workers: int) -> int:
+    return update_chat_id(data) % workers
+
+
+class WebhookServer:
+    def __init__(self, queues: list, path: str = WEBHOOK_PATH, secret: str | None = WEBHOOK_SECRET):
+        self.queues = queues
+        self.path = path
+        self.secret = secret
+        self.received = 0
+        self.rejected = 0
+        self._server: asyncio.base_events.Server | None = None
+
+    async def start(self, host: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT) -> None:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info("Webhook listening on %s:%s%s", host, port, self.path)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def dispatch(self, body: bytes) -> int:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400
+        if not isinstance(data, dict) or "update_id" not in data:
+            return 400
+        try:
+            self.queues[shard_for(data, len(self.queues))].put_nowait(body)
+        except queue.Full:
+            # Telegram redelivers updates that were not acknowledged, so a
+            # full worker queue pushes back instead of dropping the update.
+            self.rejected += 1
+            return 503
+        self.received += 1
+        return 200
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413)
+                    break
+                body = await reader.readexactly(length)
+
+                if target.split("?", 1)[0] != self.path:
+                    status = 404
+                elif method != "POST":
+                    status = 405
+                elif self.secret and headers.get("x-telegram-bot-api-secret-token") != self.secret:
+                    status = 403
+                else:
+                    status = self.dispatch(body)
+                await self._respond(writer, status)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Length: 0\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+
+async def _worker(index: int, updates: multiprocessing.Queue) -> None:
+    from bot import build_application, post_init, post_shutdown
+    from resources import catalogue
+    from metrics import metrics_server
+
+    # Each worker has its own registry, so each serves it on its own port.
+    if metrics_server.port:
+        metrics_server.port += index
+    app = build_application()
+    catalogue.watch()
+    loop = asyncio.get_running_loop()
+    await app.initialize()
+    await app.start()
+    await post_init(app)
+    logger.info("Webhook worker %s started", index)
+    try:
+        while True:
+            body = await loop.run_in_executor(None, updates.get)
+            if body is None:
+                break
+            await app.update_queue.put(Update.de_json(json.loads(body), app.bot))
+    finally:
+        await app.stop()
+        await app.shutdown()
+        await post_shutdown(app)
+        logger.info("Webhook worker %s stopped", index)
+
+
+def worker_main(index: int, updates: multiprocessing.Queue) -> None:
+    # Ctrl+C reaches the whole process group; workers wait for the parent's
+    # stop sentinel instead so queued updates are still handled.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from logs import setup_logging, stop_logging
+    setup_logging()
+    try:
+        asyncio.run(_worker(index, updates))
+    finally:
+        stop_logging()
+
+
+async def _serve(queues: list, processes: list) -> None:
+    server = WebhookServer(queues)
+    await server.start()
+
+    if WEBHOOK_URL:
+        async with Bot(BOT_TOKEN, base_url=BOT_API_BASE_URL, base_file_url=BOT_API_FILE_URL) as bot:
+            await bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=DROP_PENDING_UPDATES,
+            )
+        logger.info("Webhook registered at %s%s", WEBHOOK_URL, WEBHOOK_PATH)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        while not stop.is_set():
+            dead = [process.name for process in processes if not process.is_alive()]
+            if dead:
+                logger.error("Webhook workers exited unexpectedly: %s", ", ".join(dead))
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await server.stop()
+
+
+def run_webhook(workers: int = WEBHOOK_WORKERS) -> None:
+    # Updates are sharded by chat id, so every update of one chat is handled
+    # by the same worker process, in order, with that worker's state.
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue(maxsize=WEBHOOK_QUEUE_SIZE) for _ in range(workers)]
+    processes = [
+        ctx.Process(target=worker_main, args=(index, queues[index]), name=f"webhook-worker-{index}")
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        asyncio.run(_serve(queues, processes))
+    finally:
+        for updates in queues:
+            updates.put(None)
+        for process in processes:
+            process.join()
@@ -0,0 +1,36 @@
+from conversations import ConversationStore
+
+
+def over_budget_store(**kwargs) -> ConversationStore:
+    store = ConversationStore(token_budget=60, **kwargs)
+    store.set_prompt("chat", "Ти помічник.")
+    for index in range(10):
+        store.append("chat", f"питання номер {index} " * 3, f"відповідь номер {index} " * 3)
+    return store
+
+
+def test_failed_summary_pauses_folding():
+    store = over_budget_store(fold_cooldown=60)
+    session, end, turns = store.begin_fold("chat")
+    store.finish_fold("chat", session, end, None)
+
+    assert store.begin_fold("chat") is None
+    assert store.stats()["fold_failures"] == 1
+
+
+def test_folding_resumes_after_cooldown():
+    store = over_budget_store(fold_cooldown=0)
+    session, end, turns = store.begin_fold("chat")
+    store.finish_fold("chat", session, end, None)
+
+    assert store.begin_fold("chat") is not None
+
+
+def test_first_fold_keeps_the_size_exact():
+    store = over_budget_store()
+    session, end, turns = store.begin_fold("chat")
+    store.finish_fold("chat", session, end, "Користувач питав про числа.")
+
+    restored = ConversationStore()
+    restored.restore("chat", store.export("chat"))
+    assert store.size == restored.size
@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import gpt
+from completion_cache import CompletionCache
+from gpt import ChatGPTService
+from models import model_router
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+MESSAGES = [{"role": "user", "content": "привіт"}]
+
+
+class FailingClient:
+    def __init__(self, error: Exception):
+        self.error = error
+        self.calls = 0
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=self.create))
+        )
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+class AnsweringClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(
+            completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=self.create))
+        )
+
+    async def create(self, **kwargs):
+        message = SimpleNamespace(content=f"answer from {kwargs['model']}")
+        completion = SimpleNamespace(usage=None, choices=[SimpleNamespace(message=message)])
+        return SimpleNamespace(headers=httpx.Headers(), parse=lambda: completion)
+
+
+def rate_limit_error(code: str) -> openai.RateLimitError:
+    body = {"message": code, "type": "requests", "code": code}
+    response = httpx.Response(429, request=REQUEST, json={"error": body})
+    return openai.RateLimitError(code, response=response, body=body)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    def with_client(error: Exception) -> tuple[ChatGPTService, FailingClient]:
+        client = FailingClient(error)
+        monkeypatch.setattr(gpt, "get_openai_client", lambda token: client)
+        monkeypatch.setattr(gpt, "backoff_delay", lambda attempt, retry_after=None: 0)
+        monkeypatch.setattr(gpt.request_limiter, "pause", lambda headers: None)
+        return ChatGPTService("token"), client
+    return with_client
+
+
+async def drain(deltas) -> None:
+    async for _ in deltas:
+        pass
+
+
+def test_timeout_is_not_retried(service):
+    chatgpt, client = service(openai.APITimeoutError(request=REQUEST))
+    with pytest.raises(openai.APITimeoutError):
+        asyncio.run(chatgpt._complete(MESSAGES))
+    assert client.calls == 1
+
+    chatgpt, client = service(openai.APITimeoutError(request=REQUEST))
+    with pytest.raises(openai.APITimeoutError):
+        asyncio.run(drain(chatgpt._stream(MESSAGES)))
+    assert client.calls == 1
+
+
+def test_insufficient_quota_is_not_retried(service):
+    chatgpt, client = service(rate_limit_error("insufficient_quota"))
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(chatgpt._complete(MESSAGES))
+    assert client.calls == 1
+
+
+def test_rate_limit_is_retried(service):
+    chatgpt, client = service(rate_limit_error("rate_limit_exceeded"))
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(chatgpt._complete(MESSAGES))
+    assert client.calls == gpt.OPENAI_MAX_RETRIES + 1
+
+
+@pytest.mark.parametrize("degraded", [False, True])
+def test_only_primary_model_answers_are_cached(monkeypatch, degraded):
+    route = model_router.route("translator")
+    model = route.fallback if degraded else route.model
+    monkeypatch.setattr(gpt, "get_openai_client", lambda token: AnsweringClient())
+    monkeypatch.setattr(model_router, "select", lambda feature: (route, model))
+    cache = CompletionCache(ttls={"translator": 60}, db_path=None)
+    chatgpt = ChatGPTService("token", cache=cache)
+
+    answer = asyncio.run(chatgpt.send_question("Переклади англійською.", "Добрий день", feature="translator"))
+
+    assert answer == f"answer from {model}"
+    assert cache.stats()["entries"] == (0 if degraded else 1)
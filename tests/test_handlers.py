@@ -0,0 +1,37 @@
+import asyncio
+from types import SimpleNamespace
+
+import handlers
+from conversations import ConversationStore
+from utils import load_prompt
+
+CHAT_ID = USER_ID = 7
+
+
+def test_gpt_turn_after_session_expiry_keeps_the_prompt(monkeypatch):
+    store = ConversationStore(ttl=3600)
+    requests = []
+
+    async def stream(messages, feature=None, timeout=None, priority=None, answered_by=None):
+        requests.append(messages)
+        yield "Відповідь"
+
+    async def send_streamed_text(update, context, deltas):
+        async for _ in deltas:
+            pass
+
+    monkeypatch.setattr(handlers.chatgpt_service, "store", store)
+    monkeypatch.setattr(handlers.chatgpt_service, "_stream", stream)
+    monkeypatch.setattr(handlers, "send_streamed_text", send_streamed_text)
+    update = SimpleNamespace(
+        effective_chat=SimpleNamespace(id=CHAT_ID),
+        effective_user=SimpleNamespace(id=USER_ID),
+        message=SimpleNamespace(text="Що таке GIL?"),
+    )
+    store.set_prompt((CHAT_ID, USER_ID), load_prompt("gpt"))
+    store._sessions[(CHAT_ID, USER_ID)].touched -= 7200
+
+    asyncio.run(handlers.gpt_message(update, SimpleNamespace()))
+
+    assert requests[0][0] == {"role": "system", "content": load_prompt("gpt")}
+    assert requests[0][-1] == {"role": "user", "content": "Що таке GIL?"}
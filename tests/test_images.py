@@ -0,0 +1,36 @@
+import json
+import os
+
+from images import ImageRegistry
+
+BOT_ID = 1000
+
+
+def test_workers_sharing_the_cache_keep_each_others_file_ids(tmp_path):
+    cache_path = str(tmp_path / "image_file_ids.json")
+    first = ImageRegistry(cache_path=cache_path)
+    second = ImageRegistry(cache_path=cache_path)
+
+    first.remember(BOT_ID, "gpt", "file-gpt")
+    second.remember(BOT_ID, "start", "file-start")
+
+    with open(cache_path, encoding="utf-8") as file:
+        saved = json.load(file)
+    assert {name: entry["file_id"] for name, entry in saved[str(BOT_ID)].items()} == {
+        "gpt": "file-gpt",
+        "start": "file-start",
+    }
+    assert os.listdir(tmp_path) == ["image_file_ids.json"]
+
+
+def test_forgotten_file_id_is_not_brought_back_by_a_merge(tmp_path):
+    cache_path = str(tmp_path / "image_file_ids.json")
+    registry = ImageRegistry(cache_path=cache_path)
+    registry.remember(BOT_ID, "gpt", "file-gpt")
+
+    registry.forget(BOT_ID, "gpt")
+    registry.remember(BOT_ID, "start", "file-start")
+
+    assert registry.file_id(BOT_ID, "gpt") is None
+    assert ImageRegistry(cache_path=cache_path).file_id(BOT_ID, "gpt") is None
+    assert ImageRegistry(cache_path=cache_path).file_id(BOT_ID, "start") == "file-start"
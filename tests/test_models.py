@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from models import FIRST_TOKEN, REQUEST, ModelRouter
+
+ROUTES = """
+default     gpt-3.5-turbo  1000  0.9
+translator  gpt-3.5-turbo  2000  0.3  gpt-4o-mini  5
+"""
+
+
+def router() -> ModelRouter:
+    return ModelRouter(source=SimpleNamespace(version=1, get=lambda key: ROUTES), cooldown=60, min_samples=10)
+
+
+def test_slow_non_streamed_requests_do_not_trigger_the_fallback():
+    models = router()
+    route = models.route("translator/en")
+    for _ in range(20):
+        models.observe_latency(route, route.model, 0.4, FIRST_TOKEN)
+        models.observe_latency(route, route.model, 12.0, REQUEST)
+
+    assert models.select("translator/en") == (route, route.model)
+    assert models.fallbacks == 0
+
+
+def test_slow_first_tokens_trigger_the_fallback():
+    models = router()
+    route = models.route("translator/en")
+    for _ in range(10):
+        models.observe_latency(route, route.model, 0.1, REQUEST)
+        models.observe_latency(route, route.model, 6.0, FIRST_TOKEN)
+
+    assert models.select("translator/en") == (route, route.fallback)
+    assert models.fallbacks == 1
@@ -0,0 +1,46 @@
+import asyncio
+import pickle
+
+from conversations import ConversationStore
+from persistence import SESSION, USER, SQLiteStateStore, StatePersistence, _encode_key
+
+
+class Exploit:
+    def __reduce__(self):
+        return (exec, ("raise SystemExit('unpickled')",))
+
+
+def test_state_round_trips_as_json(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    conversations = ConversationStore()
+    conversations.set_prompt((1, 2), "Ти помічник.")
+    conversations.append((1, 2), "Привіт", "Вітаю!")
+
+    async def save() -> None:
+        persistence = StatePersistence(SQLiteStateStore(path), conversations=conversations)
+        await persistence.update_user_data(2, {"conversation_state": "gpt", "resume_data": {"name": "Олена"}})
+        await persistence.flush()
+
+    async def load() -> tuple[dict, ConversationStore]:
+        restored = ConversationStore()
+        persistence = StatePersistence(SQLiteStateStore(path), conversations=restored)
+        return await persistence.get_user_data(), restored
+
+    asyncio.run(save())
+    user_data, restored = asyncio.run(load())
+
+    assert user_data == {2: {"conversation_state": "gpt", "resume_data": {"name": "Олена"}}}
+    assert restored.export((1, 2)) == conversations.export((1, 2))
+
+
+def test_pickled_rows_are_never_unpickled(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / "state.sqlite3"))
+    store.write([
+        (USER, _encode_key(3), pickle.dumps(Exploit())),
+        (SESSION, _encode_key([3, 3]), pickle.dumps(Exploit())),
+    ])
+
+    async def load() -> dict:
+        return await StatePersistence(store, conversations=ConversationStore()).get_user_data()
+
+    assert asyncio.run(load()) == {}
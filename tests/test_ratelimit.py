@@ -0,0 +1,44 @@
+import asyncio
+
+from ratelimit import PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, RateLimiter
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def scenario() -> list[str]:
+        limiter = RateLimiter(requests_per_min=0, tokens_per_min=0, max_concurrency=1)
+        admitted = []
+
+        async def request(name: str, priority: int) -> None:
+            async with limiter.slot(10, priority):
+                admitted.append(name)
+                await asyncio.sleep(0)
+
+        holder = await limiter.acquire(10)
+        waiters = [
+            asyncio.create_task(request("prefetch", PRIORITY_PREFETCH)),
+            asyncio.create_task(request("bulk", PRIORITY_BULK)),
+            asyncio.create_task(request("interactive-1", PRIORITY_INTERACTIVE)),
+            asyncio.create_task(request("interactive-2", PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*waiters)
+        return admitted
+
+    assert asyncio.run(scenario()) == ["interactive-1", "interactive-2", "bulk", "prefetch"]
+
+
+def test_cancelled_head_waiter_hands_over_to_the_next():
+    async def scenario() -> int:
+        limiter = RateLimiter(requests_per_min=0, tokens_per_min=0, max_concurrency=1)
+        await limiter.acquire(10)
+        head = asyncio.create_task(limiter.acquire(10, PRIORITY_INTERACTIVE))
+        nxt = asyncio.create_task(limiter.acquire(10, PRIORITY_BULK))
+        await asyncio.sleep(0)
+        head.cancel()
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.wait_for(nxt, 1)
+        return limiter.stats()["waiting"]
+
+    assert asyncio.run(scenario()) == 0
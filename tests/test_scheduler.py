@@ -0,0 +1,40 @@
+import asyncio
+
+from telegram import Update
+
+from scheduler import ChatSerialUpdateProcessor
+
+
+def update(update_id: int, chat_id: int) -> Update:
+    chat = {"id": chat_id, "type": "private"}
+    message = {"message_id": update_id, "date": 0, "chat": chat, "text": str(update_id)}
+    return Update.de_json({"update_id": update_id, "message": message}, None)
+
+
+def test_updates_of_one_chat_run_in_order_while_chats_overlap():
+    async def scenario() -> list[tuple[str, int, int]]:
+        processor = ChatSerialUpdateProcessor(max_concurrent_chats=4)
+        events = []
+
+        async def handle(chat_id: int, update_id: int, delay: float) -> None:
+            events.append(("start", chat_id, update_id))
+            await asyncio.sleep(delay)
+            events.append(("end", chat_id, update_id))
+
+        jobs = [(1, 1, 0.03), (1, 2, 0.0), (2, 3, 0.0), (1, 4, 0.01)]
+        await asyncio.gather(*(
+            processor.do_process_update(update(update_id, chat_id), handle(chat_id, update_id, delay))
+            for chat_id, update_id, delay in jobs
+        ))
+        assert processor.stats()["processed"] == 4
+        return events
+
+    events = asyncio.run(scenario())
+    chat_one = [event for event in events if event[1] == 1]
+    assert chat_one == [
+        ("start", 1, 1), ("end", 1, 1),
+        ("start", 1, 2), ("end", 1, 2),
+        ("start", 1, 4), ("end", 1, 4),
+    ]
+    # The other chat is not held up behind the slow first update.
+    assert events.index(("end", 2, 3)) < events.index(("end", 1, 1))
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_cancelled_waiter_leaves_the_call_to_the_others():
+    async def scenario() -> tuple[str, int]:
+        flights = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def fetch() -> str:
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "факт"
+
+        first = asyncio.create_task(flights.do("key", fetch))
+        second = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, calls
+
+    assert asyncio.run(scenario()) == ("факт", 1)
+
+
+def test_last_waiter_cancelled_cancels_the_call():
+    async def scenario() -> bool:
+        flights = SingleFlight()
+        upstream_cancelled = asyncio.Event()
+
+        async def fetch() -> str:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                upstream_cancelled.set()
+                raise
+            return "never"
+
+        waiters = [asyncio.create_task(flights.do("key", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(upstream_cancelled.wait(), 1)
+        return flights.stats()["in_flight"] == 0
+
+    assert asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter():
+    async def scenario() -> list:
+        flights = SingleFlight()
+
+        async def fetch() -> str:
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream failed")
+
+        return await asyncio.gather(*(flights.do("key", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [type(result) for result in results] == [RuntimeError] * 3
+
+
+def test_stream_joined_mid_flight_replays_earlier_deltas():
+    async def scenario() -> tuple[list[str], list[str], int]:
+        flights = SingleFlight()
+        first_delta_sent = asyncio.Event()
+        release = asyncio.Event()
+
+        async def fetch():
+            yield "Доброго "
+            first_delta_sent.set()
+            await release.wait()
+            yield "ранку"
+
+        async def read() -> list[str]:
+            return [delta async for delta in flights.stream("key", fetch)]
+
+        early = asyncio.create_task(read())
+        await first_delta_sent.wait()
+        late = asyncio.create_task(read())
+        await asyncio.sleep(0)
+        release.set()
+        return await early, await late, flights.stats()["started"]
+
+    early, late, started = asyncio.run(scenario())
+    assert early == late == ["Доброго ", "ранку"]
+    assert started == 1
+
+
+def test_stream_error_reaches_every_reader():
+    async def scenario() -> list:
+        flights = SingleFlight()
+
+        async def fetch():
+            yield "частина"
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream failed")
+
+        async def read() -> list[str]:
+            return [delta async for delta in flights.stream("key", fetch)]
+
+        return await asyncio.gather(read(), read(), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [type(result) for result in results] == [RuntimeError] * 2
@@ -0,0 +1,27 @@
+import asyncio
+
+import translator
+
+
+def test_failed_translation_waits_for_its_segments(monkeypatch):
+    started = []
+
+    async def send_question(prompt, segment, feature=None, priority=None):
+        started.append(asyncio.current_task())
+        await asyncio.sleep(0)
+        raise RuntimeError("upstream failed")
+
+    monkeypatch.setattr(translator.chatgpt_service, "send_question", send_question)
+    text = "\n\n".join(f"Абзац номер {index}. " * 5 for index in range(6))
+
+    async def translate() -> list[bool]:
+        try:
+            async for _ in translator.translate_text("prompt", text, "translator/en", max_chars=100, parallelism=4):
+                pass
+        except RuntimeError:
+            pass
+        return [task.done() for task in started]
+
+    done = asyncio.run(translate())
+    assert len(done) > 1
+    assert all(done)
@@ -0,0 +1,57 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram.constants import MessageLimit
+
+from utils import send_streamed_text
+
+LIMIT = MessageLimit.MAX_TEXT_LENGTH
+
+
+class FakeMessage:
+    def __init__(self, bot, text):
+        self.bot = bot
+        self.text = text
+
+    async def edit_text(self, text, **kwargs):
+        self.bot.check(text)
+        self.text = text
+
+    async def delete(self):
+        self.bot.messages.remove(self)
+
+
+class FakeBot:
+    def __init__(self):
+        self.messages = []
+
+    @staticmethod
+    def check(text):
+        assert 0 < len(text) <= LIMIT, f"message of {len(text)} characters"
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.check(text)
+        message = FakeMessage(self, text)
+        self.messages.append(message)
+        return message
+
+
+def stream(*deltas):
+    async def deltas_iter():
+        for delta in deltas:
+            yield delta
+    return deltas_iter()
+
+
+def test_single_delta_over_twice_the_limit_is_split():
+    bot = FakeBot()
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=1))
+    context = SimpleNamespace(bot=bot)
+    text = " ".join(["слово"] * 2100)
+    assert len(text) > 2 * LIMIT
+
+    result = asyncio.run(send_streamed_text(update, context, stream(text), parse_mode=None, interval=0))
+
+    assert result == text
+    assert len(bot.messages) == 4
+    assert " ".join(message.text for message in bot.messages).split() == text.split()